@@ -1,5 +1,33 @@
+import logging
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    from .warmup import warm_up
+
+    try:
+        for name, items, seconds in warm_up():
+            logger.info('Warmed up %s: %s in %.2fs', name, items, seconds)
+    except Exception:
+        logger.exception('Warm-up failed')
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # warm every serving process, but not migrate and other commands;
+        # a preloading gunicorn master warms up before forking instead
+        command = os.path.basename(sys.argv[0]) == 'manage.py'
+        if settings.WARMUP_ON_START and not settings.PRELOAD_APP and (
+                not command or sys.argv[1:2] == ['runserver']):
+            # requests are served meanwhile, the warm-up only has a head start
+            threading.Thread(
+                target=warm_up, name='warm-up', daemon=True).start()
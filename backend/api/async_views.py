@@ -0,0 +1,107 @@
+"""Async versions of slow I/O-bound endpoints, served under ASGI.
+
+Under ASGI Django runs all sync views of a worker one at a time in a
+single thread, so one slow cart download or image upload would stall
+every other request. These views keep the event loop free and run the
+blocking parts (token lookup, ORM queries, base64 image decoding and
+Pillow validation) in the thread pool, many requests in parallel.
+"""
+import asyncio
+from concurrent.futures import BrokenExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.db.threads import database_sync_to_async
+from . import pdf, views
+from .authentication import MeteredTokenAuthentication
+
+
+def in_thread_pool(view):
+    """Async view running a sync (DRF) view in the thread pool."""
+
+    @database_sync_to_async
+    def run(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        # DRF responses are rendered lazily, don't leave it to the loop
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+
+    # wraps() keeps csrf_exempt and the DRF cls/actions attributes
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run(request, *args, **kwargs)
+
+    return async_view
+
+
+def unauthorized(detail: str) -> JsonResponse:
+    response = JsonResponse({'detail': detail}, status=401)
+    response['WWW-Authenticate'] = (
+        MeteredTokenAuthentication().authenticate_header(None))
+    return response
+
+
+async def authenticate_get(request: HttpRequest):
+    """(user, None) of an authenticated GET or (None, error response)."""
+    if request.method != 'GET':
+        return None, JsonResponse(
+            {'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        credentials = await database_sync_to_async(
+            MeteredTokenAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return None, unauthorized(str(e.detail))
+    if credentials is None:
+        return None, unauthorized(
+            'Authentication credentials were not provided.')
+    return credentials[0], None
+
+
+async def download_shopping_cart(request: HttpRequest) -> HttpResponse:
+    user, error = await authenticate_get(request)
+    if error is not None:
+        return error
+    ingredients = await database_sync_to_async(
+        views.shopping_cart_ingredients)(user)
+    return views.shopping_cart_csv(ingredients)
+
+
+async def download_shopping_cart_pdf(request: HttpRequest) -> HttpResponse:
+    user, error = await authenticate_get(request)
+    if error is not None:
+        return error
+    ingredients = await database_sync_to_async(
+        views.shopping_cart_ingredients)(user)
+    for _ in range(pdf.RENDER_ATTEMPTS):
+        path, rendering = pdf.shopping_list_pdf(user.pk, ingredients)
+        if rendering is None:
+            return views.shopping_cart_pdf(path)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(rendering)),
+                settings.PDF_RENDER_TIMEOUT)
+            return views.shopping_cart_pdf(path)
+        except asyncio.TimeoutError:
+            return JsonResponse(
+                {'errors': 'PDF is not ready yet, try again later'},
+                status=503)
+        except BrokenExecutor:
+            continue
+        except Exception:
+            break
+    return JsonResponse(
+        {'errors': 'Could not render the PDF, try the CSV list'}, status=500)
+
+
+recipe_list = in_thread_pool(views.RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}))
+bulk_favorite = in_thread_pool(views.RecipeViewSet.as_view(
+    {'post': 'bulk_favorite', 'delete': 'bulk_favorite'}))
+bulk_shopping_cart = in_thread_pool(views.RecipeViewSet.as_view(
+    {'post': 'bulk_shopping_cart', 'delete': 'bulk_shopping_cart'}))
+bulk_subscribe = in_thread_pool(views.UserViewSet.as_view(
+    {'post': 'bulk_subscribe', 'delete': 'bulk_subscribe'}))
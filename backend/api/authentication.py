@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.metrics import TOKEN_AUTH_LATENCY, TOKEN_AUTH_LOOKUPS
+
+
+class MeteredTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication counting and timing token lookups."""
+
+    def authenticate_credentials(self, key):
+        started = time.perf_counter()
+        try:
+            credentials = super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            TOKEN_AUTH_LOOKUPS.labels('invalid').inc()
+            raise
+        finally:
+            TOKEN_AUTH_LATENCY.observe(time.perf_counter() - started)
+        TOKEN_AUTH_LOOKUPS.labels('success').inc()
+        return credentials
+
+
+def prune_tokens() -> int:
+    """Delete tokens of inactive users and ones older than
+    AUTH_TOKEN_MAX_AGE seconds, if set. Returns the number deleted."""
+    stale = Q(user__is_active=False)
+    if settings.AUTH_TOKEN_MAX_AGE:
+        stale |= Q(created__lt=timezone.now() - timedelta(
+            seconds=settings.AUTH_TOKEN_MAX_AGE))
+    deleted, _ = Token.objects.filter(stale).delete()
+    return deleted
@@ -1,16 +1,28 @@
 from django.contrib.auth import get_user_model
-from django_filters.rest_framework import FilterSet, BooleanFilter
+from django_filters.rest_framework import (
+    FilterSet, BooleanFilter, CharFilter, ChoiceFilter)
 
 from food.models import Recipe
+from food.search import search_recipes
 
 User = get_user_model()
 
+ORDERINGS = {
+    'popular': ('-popularity', '-pub_date'),
+    'trending': ('-trending', '-pub_date'),
+}
+
 
 class RecipeFilter(FilterSet):
     is_favorited = BooleanFilter(
         field_name='favorites', method='relation_filter')
     is_in_shopping_cart = BooleanFilter(
         field_name='shopping_cart', method='relation_filter')
+    search = CharFilter(method='search_filter')
+    ordering = ChoiceFilter(
+        choices=[(name, name) for name in ORDERINGS],
+        method='ordering_filter',
+    )
 
     def relation_filter(self, queryset, name, value):
         params = {f'{name}__user': self.request.user}
@@ -18,6 +30,12 @@ class RecipeFilter(FilterSet):
             return queryset.filter(**params)
         return queryset.exclude(**params)
 
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
+
     class Meta:
         model = Recipe
         fields = ['author']
@@ -1,4 +1,14 @@
+import base64
+from datetime import datetime
+from typing import Optional
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.db.paginator import EstimatedCountPaginator
+from food.feed import Position
 
 
 class MyPageNumberPagination(PageNumberPagination):
@@ -6,3 +16,54 @@ class MyPageNumberPagination(PageNumberPagination):
     page_size = 100
     page_size_query_param = 'limit'
     max_page_size = 10000
+
+
+class UserPageNumberPagination(MyPageNumberPagination):
+    max_page_size = 100
+    django_paginator_class = EstimatedCountPaginator
+
+
+class FeedCursorPagination:
+    """Cursor pagination over a (pub_date, id) position.
+
+    Unlike rest_framework CursorPagination it doesn't need a queryset,
+    so it works for the feed merged in python by food.feed.get_feed.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request) -> int:
+        limit = request.query_params.get(self.page_size_query_param, '')
+        if limit.isdigit() and int(limit) > 0:
+            return min(int(limit), self.max_page_size)
+        return self.page_size
+
+    def decode_cursor(self, request) -> Optional[Position]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = base64.urlsafe_b64decode(
+                encoded.encode('ascii')).decode('ascii').split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, request, position: Position) -> str:
+        pub_date, pk = position
+        encoded = base64.urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, request, data,
+                               next_position: Optional[Position]
+                               ) -> Response:
+        next_url = None
+        if next_position is not None:
+            next_url = self.encode_cursor(request, next_position)
+        return Response({'next': next_url, 'results': data})
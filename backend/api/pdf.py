@@ -0,0 +1,159 @@
+"""Printable PDF shopping lists.
+
+PDFs are rendered by a pool of PDF_WORKERS processes, so a long list
+never holds the GIL of the serving worker, and are cached in
+PDF_CACHE_DIR under a hash of the user id and the aggregated cart:
+downloading an unchanged cart again only sends the file.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Future
+from contextlib import suppress
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+FONT_NAME = 'ShoppingListFont'
+TITLE = 'Список покупок'
+FONT_SIZE = 11
+TITLE_FONT_SIZE = 16
+MARGIN = 50
+LINE_HEIGHT = 18
+PRUNE_INTERVAL = 600
+# renderings of a list tried if a pool process dies
+RENDER_ATTEMPTS = 2
+
+_executor: Optional['ProcessPoolExecutor'] = None
+_rendering: Dict[str, Future] = {}
+_lock = threading.Lock()
+_pruned_at = 0.0
+
+
+def render(path: str, font: str, ingredients: List[dict]):
+    """Write the list to path; runs in a pool process."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font))
+
+    width, height = A4
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        pdf = canvas.Canvas(temporary, pagesize=A4, pageCompression=1)
+        pdf.setTitle(TITLE)
+        page = 1
+        pdf.setFont(FONT_NAME, TITLE_FONT_SIZE)
+        pdf.drawString(MARGIN, height - MARGIN, TITLE)
+        y = height - MARGIN - 2 * LINE_HEIGHT
+        for ingredient in ingredients:
+            if y < MARGIN + LINE_HEIGHT:
+                pdf.setFont(FONT_NAME, FONT_SIZE - 2)
+                pdf.drawRightString(width - MARGIN, MARGIN / 2, str(page))
+                pdf.showPage()
+                page += 1
+                y = height - MARGIN
+            pdf.setFont(FONT_NAME, FONT_SIZE)
+            pdf.drawString(MARGIN, y, f'☐  {ingredient["name"]}')
+            pdf.drawRightString(
+                width - MARGIN, y,
+                f'{ingredient["quantity"]} {ingredient["unit"]}')
+            y -= LINE_HEIGHT
+        pdf.setFont(FONT_NAME, FONT_SIZE - 2)
+        pdf.drawRightString(width - MARGIN, MARGIN / 2, str(page))
+        pdf.save()
+        os.replace(temporary, path)
+    except BaseException:
+        # a failed rendering must not leave its file behind
+        with suppress(FileNotFoundError):
+            os.remove(temporary)
+        raise
+
+
+def prune(directory: str, max_age: float):
+    """Delete cached lists older than max_age seconds."""
+    deadline = time.time() - max_age
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _get_executor() -> 'ProcessPoolExecutor':
+    global _executor
+    if _executor is None:
+        # imported on the first PDF, multiprocessing is slow to import
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        os.makedirs(settings.PDF_CACHE_DIR, exist_ok=True)
+        # forking a threaded server process is unsafe, start afresh
+        _executor = ProcessPoolExecutor(
+            settings.PDF_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _submit(func, *args) -> Future:
+    """Submit to the pool, replacing it once if a process of it died."""
+    global _executor
+    try:
+        return _get_executor().submit(func, *args)
+    except BrokenExecutor:
+        logger.warning('PDF process pool is broken, starting a new one')
+        _executor.shutdown(wait=False)
+        _executor = None
+        return _get_executor().submit(func, *args)
+
+
+def _rendered(digest: str, future: Future):
+    _rendering.pop(digest, None)
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Rendering of PDF %s failed', digest,
+                     exc_info=future.exception())
+
+
+def cart_digest(user_id: int, ingredients: List[dict]) -> str:
+    contents = json.dumps(
+        [user_id, ingredients], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+def shopping_list_pdf(user_id: int, ingredients: List[dict]
+                      ) -> Tuple[str, Optional[Future]]:
+    """Path of the PDF list and the future of its rendering, if any.
+
+    Concurrent requests of the same list share one rendering. The future
+    raises BrokenExecutor if a pool process died while rendering; the
+    pool is replaced on the next call.
+    """
+    global _pruned_at
+    digest = cart_digest(user_id, ingredients)
+    path = os.path.join(settings.PDF_CACHE_DIR, f'{digest}.pdf')
+    with _lock:
+        future = _rendering.get(digest)
+        if future is not None:
+            return path, future
+        if os.path.exists(path):
+            return path, None
+        future = _submit(render, path, settings.PDF_FONT, ingredients)
+        _rendering[digest] = future
+        future.add_done_callback(lambda done: _rendered(digest, done))
+        if time.monotonic() - _pruned_at > PRUNE_INTERVAL:
+            _pruned_at = time.monotonic()
+            _submit(
+                prune, settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_AGE)
+    return path, future
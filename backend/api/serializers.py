@@ -3,15 +3,34 @@ import base64
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.core.files.base import ContentFile
+from django.db.models import QuerySet
 from django.db.transaction import atomic
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from food import models
+from core.metrics import IMAGE_QUEUE_DEPTH
+from food import facets, feed, models
 
 User = get_user_model()
 
 
+BULK_MAX_IDS = 1000
+
+
+def only_columns(queryset: QuerySet, serializer_class) -> QuerySet:
+    """Load only the columns the serializer declares in Meta.only_fields."""
+    fields = getattr(serializer_class.Meta, 'only_fields', None)
+    return queryset if fields is None else queryset.only(*fields)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+    )
+
+
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
@@ -31,14 +50,19 @@ class UserSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count',
         )
+        only_fields = ('id', 'email', 'username', 'first_name', 'last_name')
 
     def _exclude_fields(self, exclude):
         for exclude_name in exclude:
             self.fields.pop(exclude_name)
 
     def get_is_subscribed(self, obj: User) -> bool:
+        # annotated by the views listing users
+        annotated = getattr(obj, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
         user = self.context.get('request').user
-        if isinstance(user, AnonymousUser):
+        if isinstance(user, AnonymousUser) or user.pk == obj.pk:
             return False
 
         return models.Subscription.objects.filter(
@@ -57,10 +81,15 @@ class UserSerializer(serializers.ModelSerializer):
             if limit < 1:
                 raise ValidationError('recipes_limit should be > 0')
 
-        recipes = models.Recipe.objects.filter(author=obj)[:limit]
-        return RecipeShortSerializer(recipes, many=True).data
+        recipes = only_columns(
+            models.Recipe.objects.filter(author=obj), RecipeShortSerializer)
+        return RecipeShortSerializer(recipes[:limit], many=True).data
 
     def get_recipes_count(self, obj: User) -> int:
+        # annotated by the subscriptions list
+        annotated = getattr(obj, 'recipes_count', None)
+        if annotated is not None:
+            return annotated
         return models.Recipe.objects.filter(author=obj).count()
 
 
@@ -120,6 +149,7 @@ class IngredientsField(serializers.Field):
 
 
 class Base64ImageField(serializers.ImageField):
+    @IMAGE_QUEUE_DEPTH.track_inprogress()
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             # base64 encoded image - decode
@@ -190,6 +220,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         self.add_tags(recipe, tag_ids)
         self.add_ingredients(recipe, ingredients)
+        feed.fan_out(recipe)
         return recipe
 
     @atomic()
@@ -219,6 +250,8 @@ class RecipeSerializer(serializers.ModelSerializer):
             obj = models.Tag.objects.get(pk=tag_id)
             links.append(models.RecipeTag(recipe=recipe, tag=obj))
         models.RecipeTag.objects.bulk_create(links)
+        # bulk_create sends no post_save to count them
+        facets.bump_tag_counts([link.tag_id for link in links], 1)
 
     def add_ingredients(self, recipe, ingredients):
         links = []
@@ -248,6 +281,9 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 class RecipeShortSerializer(RecipeSerializer):
 
+    class Meta(RecipeSerializer.Meta):
+        only_fields = ('id', 'name', 'image', 'cooking_time')
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -261,3 +297,18 @@ class RecipeShortSerializer(RecipeSerializer):
         ]
         for exclude_name in exclude_fields:
             self.fields.pop(exclude_name)
+
+
+class RecipeCoverageSerializer(RecipeShortSerializer):
+    matched = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ('matched', 'total')
+
+
+class RecipeSimilarSerializer(RecipeShortSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ('similarity',)
@@ -0,0 +1,350 @@
+import os
+import tempfile
+from concurrent import futures
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from food import catalog, facets, feed, models
+from . import pdf
+
+User = get_user_model()
+
+
+class RecipeFacetsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        breakfast = models.Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast')
+        dinner = models.Tag.objects.create(
+            name='Ужин', color='#8775D2', slug='dinner')
+        recipes = [
+            ('Овсяная каша', [breakfast]),
+            ('Овсяное печенье', [breakfast, dinner]),
+            ('Борщ', [dinner]),
+        ]
+        for name, tags in recipes:
+            recipe = models.Recipe.objects.create(
+                author=author, name=name, text=name, image='img1.png',
+                cooking_time=10)
+            for tag in tags:
+                models.RecipeTag.objects.create(recipe=recipe, tag=tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, response):
+        return {facet['slug']: facet['count']
+                for facet in response.data['facets']['tags']}
+
+    def test_facets_without_filters(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(response),
+                         {'breakfast': 2, 'dinner': 2})
+
+    def test_facets_with_search(self):
+        # the search adds raw SQL on food_recipe, see food.search
+        response = self.client.get('/api/recipes/', {'search': 'овсян'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.counts(response),
+                         {'breakfast': 2, 'dinner': 1})
+
+    def test_facets_ignore_tag_filter(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'овсян', 'tags': 'dinner'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(self.counts(response),
+                         {'breakfast': 2, 'dinner': 1})
+
+    def test_global_facets_match_filtered_ones(self):
+        self.assertEqual(
+            facets.global_tag_facets(),
+            facets.tag_facets(models.Recipe.objects.all(), 'facets:all'))
+
+    def test_bump_tag_counts_stops_at_zero(self):
+        # recipes_count has a CHECK (>= 0) constraint on PostgreSQL and
+        # SQLite, a count going below zero would fail the whole request
+        tag = models.Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch')
+        facets.bump_tag_counts([tag.pk, tag.pk], 1)
+        facets.bump_tag_counts([tag.pk] * 3, -1)
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipes_count, 0)
+
+
+class BulkRelationsTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='pass')
+            for number in range(2)
+        ]
+        cls.recipes = [
+            models.Recipe.objects.create(
+                author=cls.authors[number % 2], name=f'Рецепт {number}',
+                text='текст', image='img1.png', cooking_time=10)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def statuses(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [(result['id'], result['status'])
+                for result in response.data['results']]
+
+    def test_favorite_add_readd_and_unknown(self):
+        first, second, _ = (recipe.pk for recipe in self.recipes)
+        url = '/api/recipes/bulk_favorite/'
+        self.assertEqual(self.statuses('post', url, [first]),
+                         [(first, 'created')])
+        self.assertEqual(
+            self.statuses('post', url, [first, second, 999, second]),
+            [(first, 'exists'), (second, 'created'), (999, 'not_found')])
+        self.assertEqual(
+            models.FavoriteRecipe.objects.filter(user=self.user).count(), 2)
+
+    def test_favorite_remove_and_remove_missing(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        url = '/api/recipes/bulk_favorite/'
+        self.statuses('post', url, [first, second])
+        self.assertEqual(
+            self.statuses('delete', url, [first, third, 999]),
+            [(first, 'deleted'), (third, 'missing'), (999, 'missing')])
+        self.assertEqual(
+            list(models.FavoriteRecipe.objects.filter(
+                user=self.user).values_list('recipe', flat=True)),
+            [second])
+
+    def test_shopping_cart_statuses(self):
+        first, second, _ = (recipe.pk for recipe in self.recipes)
+        url = '/api/recipes/bulk_shopping_cart/'
+        self.assertEqual(self.statuses('post', url, [first, second]),
+                         [(first, 'created'), (second, 'created')])
+        self.assertEqual(self.statuses('delete', url, [second]),
+                         [(second, 'deleted')])
+        self.assertEqual(self.statuses('post', url, [first, second]),
+                         [(first, 'exists'), (second, 'created')])
+
+    def test_subscribe_statuses_and_feed(self):
+        url = '/api/users/bulk_subscribe/'
+        ids = [author.pk for author in self.authors]
+        self.assertEqual(
+            self.statuses('post', url, ids + [self.user.pk, 999]),
+            [(ids[0], 'created'), (ids[1], 'created'),
+             (self.user.pk, 'invalid'), (999, 'not_found')])
+        self.assertEqual(
+            set(models.FeedEntry.objects.filter(
+                user=self.user).values_list('recipe', flat=True)),
+            {recipe.pk for recipe in self.recipes})
+        self.assertEqual(self.statuses('delete', url, ids[:1]),
+                         [(ids[0], 'deleted')])
+        self.assertEqual(
+            set(models.FeedEntry.objects.filter(
+                user=self.user).values_list('recipe__author', flat=True)),
+            {ids[1]})
+
+    def test_invalid_payload(self):
+        response = self.client.post(
+            '/api/recipes/bulk_favorite/', {'ids': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class FeedTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.pushed, cls.pulled, other = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='pass')
+            for name in ('user', 'pushed', 'pulled', 'other'))
+        for user, author in ((cls.user, cls.pushed),
+                             (cls.user, cls.pulled),
+                             (other, cls.pulled)):
+            models.Subscription.objects.create(user=user, subscribed_to=author)
+        cls.started = timezone.now()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        self.count = 0
+
+    def add_recipe(self, author):
+        self.count += 1
+        recipe = models.Recipe.objects.create(
+            author=author, name=f'Рецепт {self.count}', text='текст',
+            image='img1.png', cooking_time=10)
+        # equal dates of every other recipe check the id tie-break
+        recipe.pub_date = self.started + timedelta(minutes=self.count // 2)
+        recipe.save(update_fields=['pub_date'])
+        feed.fan_out(recipe)
+        return recipe
+
+    def read_feed(self, limit):
+        pages, url = [], f'/api/users/feed/?limit={limit}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe['id'] for recipe in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def newest_first(self, recipes):
+        return [recipe.pk for recipe in sorted(
+            recipes, key=lambda recipe: (recipe.pub_date, recipe.pk),
+            reverse=True)]
+
+    def test_cursor_continuity(self):
+        recipes = [self.add_recipe(self.pushed) for _ in range(7)]
+        pages = self.read_feed(limit=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.newest_first(recipes))
+
+    def test_push_and_pull_merge(self):
+        # pulled crosses FANOUT_LIMIT after its first recipes are fanned out
+        recipes = [self.add_recipe(author)
+                   for author in (self.pushed, self.pulled) * 2]
+        with mock.patch.object(feed, 'FANOUT_LIMIT', 1):
+            cache.clear()
+            recipes += [self.add_recipe(author)
+                        for author in (self.pulled, self.pushed) * 2]
+            self.assertEqual(feed.pull_authors(), {self.pulled.pk})
+            pages = self.read_feed(limit=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 2])
+        self.assertEqual(sum(pages, []), self.newest_first(recipes))
+
+    def test_unfollow_cleanup(self):
+        self.add_recipe(self.pushed)
+        kept = self.add_recipe(self.pulled)
+        response = self.client.delete(
+            f'/api/users/{self.pushed.pk}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(models.FeedEntry.objects.filter(
+            user=self.user, recipe__author=self.pushed).exists())
+        self.assertEqual(self.read_feed(limit=10), [[kept.pk]])
+
+    def test_trim(self):
+        recipes = [self.add_recipe(self.pushed) for _ in range(5)]
+        self.assertEqual(feed.trim(max_entries=2), 3)
+        self.assertEqual(
+            list(models.FeedEntry.objects.filter(
+                user=self.user).values_list('recipe', flat=True)),
+            self.newest_first(recipes)[:2])
+        self.assertEqual(feed.trim(max_entries=0), 2)
+        self.assertFalse(models.FeedEntry.objects.exists())
+
+
+class IngredientImportTests(APITestCase):
+
+    def import_rows(self, rows):
+        stats = catalog.import_ingredients(rows, batch_size=2)
+        return stats.created, stats.updated, stats.unchanged, stats.invalid
+
+    def test_import_and_reimport(self):
+        models.Ingredient.objects.create(
+            name='печенье Oreo', measurement_unit='г')
+        rows = [
+            ('мука  пшеничная ', 'г'),
+            ('Мука пшеничная', 'кг'),
+            ('печенье OREO', 'шт.'),
+            ('сахар', 'г'),
+            ('', 'г'),
+        ]
+        self.assertEqual(self.import_rows(rows), (2, 1, 0, 1))
+        self.assertEqual(
+            dict(models.Ingredient.objects.values_list(
+                'name', 'measurement_unit')),
+            {'Мука пшеничная': 'кг', 'печенье Oreo': 'шт.', 'сахар': 'г'})
+
+        self.assertEqual(self.import_rows(rows), (0, 0, 3, 1))
+        self.assertEqual(
+            self.import_rows([('сахар', 'кг'), ('соль', 'г')]), (1, 1, 0, 0))
+        self.assertEqual(models.Ingredient.objects.count(), 4)
+
+
+class ShoppingCartPdfTests(APITestCase):
+    url = '/api/recipes/download_shopping_cart/pdf/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cart.pdf')
+        overridden = override_settings(PDF_CACHE_DIR=directory.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+    def renderings(self, *results):
+        """Patch shopping_list_pdf to return futures with the results."""
+        renderings = []
+        for result in results:
+            future = futures.Future()
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            elif result is not None:
+                future.set_result(result)
+            renderings.append((self.path, future))
+        return mock.patch.object(
+            pdf, 'shopping_list_pdf', side_effect=renderings)
+
+    @override_settings(PDF_RENDER_TIMEOUT=0.01)
+    def test_not_ready(self):
+        with self.renderings(None):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+
+    def test_broken_pool_is_retried(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'%PDF-1.4')
+        with self.renderings(futures.BrokenExecutor(), True) as rendering:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+        self.assertEqual(rendering.call_count, 2)
+
+    def test_broken_pool_twice(self):
+        with self.renderings(*[futures.BrokenExecutor()]
+                             * pdf.RENDER_ATTEMPTS):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 500)
+
+    def test_render_failure(self):
+        with self.renderings(ValueError('bad font')) as rendering:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(rendering.call_count, 1)
+
+    def test_render_removes_temporary_file(self):
+        ingredients = [{'name': 'соль', 'quantity': 5, 'unit': 'г'}]
+        with mock.patch.object(pdf.os, 'replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                pdf.render(self.path, settings.PDF_FONT, ingredients)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+        pdf.render(self.path, settings.PDF_FONT, ingredients)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)),
+                         ['cart.pdf'])
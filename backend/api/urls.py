@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -9,9 +10,30 @@ router.register(r'tags', views.TagViewSet)
 router.register(r'recipes', views.RecipeViewSet, basename='recipes')
 router.register(r'ingredients', views.IngredientViewSet)
 
+# djoser.urls with its user viewset replaced
+profile_router = DefaultRouter()
+profile_router.register(r'users', views.ProfileViewSet)
+
 urlpatterns = router.urls
 
 urlpatterns += [
-    path('', include('djoser.urls')),
+    path('db/pool/', views.db_pool_stats),
+    path('metrics', views.metrics_view),
+    path('', include(profile_router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    # matched before the router urls of the same sync views
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list),
+        path('recipes/download_shopping_cart/',
+             async_views.download_shopping_cart),
+        path('recipes/download_shopping_cart/pdf/',
+             async_views.download_shopping_cart_pdf),
+        path('recipes/bulk_favorite/', async_views.bulk_favorite),
+        path('recipes/bulk_shopping_cart/', async_views.bulk_shopping_cart),
+        path('users/bulk_subscribe/', async_views.bulk_subscribe),
+    ] + urlpatterns
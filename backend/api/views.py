@@ -1,25 +1,47 @@
-import csv
-from typing import Optional
+import hashlib
+from concurrent import futures
+from typing import Callable, Collection, Iterable, List, Optional, Type
 
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, F
-from django.http import HttpRequest, HttpResponse
+from django.db.models import (
+    BooleanField, Count, Exists, Model, OuterRef, QuerySet, Sum, Value)
+from django.db.transaction import atomic
+from django.http import FileResponse, HttpRequest, HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser import views as djoser_views
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.filters import SearchFilter
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from food import models
-from . import serializers
+from core import compression, metrics
+from core.db.pool import pool_stats
+from food import catalog, facets, feed, models, units
+from food.ingredient_index import ingredient_index
+from food.scores import (
+    FAVORITE_WEIGHT, SHOPPING_CART_WEIGHT, bump_popularity)
+from food.similar import TOP_K, similar_recipes, similarity_index
+from . import pdf, serializers
 from .filters import RecipeFilter
+from .pagination import FeedCursorPagination, UserPageNumberPagination
 from .permissions import AuthorOrReadOnly
 
 User = get_user_model()
 
 
+COOK_DEFAULT_LIMIT = 10
+COOK_MAX_LIMIT = 100
+SIMILAR_DEFAULT_LIMIT = 10
+# filters the tag facets depend on, the tags filter itself is not one
+FACET_FILTERS = ('author', 'search')
+USER_FACET_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
 def response_400(s: str) -> Response:
     return Response(
         data={'errors': s},
@@ -27,19 +49,190 @@ def response_400(s: str) -> Response:
     )
 
 
-class UserViewSet(viewsets.GenericViewSet):
+def store_json(key: str, data, timeout: int) -> dict:
+    """Cache rendered data with its compressed variants."""
+    body = JSONRenderer().render(data)
+    entry = {'body': body, **compression.compress_variants(body)}
+    cache.set(key, entry, timeout)
+    return entry
+
+
+def cached_json(key: str, name: str, build: Callable[[], object],
+                timeout: int) -> HttpResponse:
+    """JSON response of build() cached with its compressed variants."""
+    entry = cache.get(key)
+    metrics.record_cache(name, entry is not None)
+    if entry is None:
+        entry = store_json(key, build(), timeout)
+    response = HttpResponse(
+        entry.pop('body'), content_type='application/json')
+    response.precompressed = entry
+    return response
+
+
+BULK_CREATED = 'created'
+BULK_EXISTS = 'exists'
+BULK_DELETED = 'deleted'
+BULK_MISSING = 'missing'
+BULK_NOT_FOUND = 'not_found'
+BULK_INVALID = 'invalid'
+
+IdsCallback = Callable[[Iterable[int]], None]
+
+
+@atomic
+def bulk_relations(request: HttpRequest,
+                   model: Type[Model],
+                   field: str,
+                   targets: QuerySet,
+                   invalid_ids: Collection[int] = (),
+                   on_created: Optional[IdsCallback] = None,
+                   on_deleted: Optional[IdsCallback] = None,
+                   ) -> Response:
+    """Link (POST) or unlink (DELETE) request.user and many targets.
+
+    model is the user <-> target relation, field is its target FK name.
+    Responds with a status for every requested id.
+    """
+    serializer = serializers.BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+
+    relations = model.objects.filter(user=request.user)
+    linked = set(relations.filter(
+        **{f'{field}__in': ids}
+    ).values_list(f'{field}_id', flat=True))
+
+    if request.method == 'POST':
+        found = set(targets.filter(
+            pk__in=ids
+        ).exclude(
+            pk__in=invalid_ids
+        ).values_list('pk', flat=True))
+        created = found - linked
+        model.objects.bulk_create(
+            [model(user=request.user, **{f'{field}_id': pk})
+             for pk in created],
+            ignore_conflicts=True,
+        )
+        if created and on_created is not None:
+            on_created(created)
+        statuses = {pk: BULK_CREATED for pk in created}
+        statuses.update((pk, BULK_EXISTS) for pk in linked)
+        statuses.update((pk, BULK_INVALID) for pk in invalid_ids)
+        default = BULK_NOT_FOUND
+    else:
+        relations.filter(**{f'{field}__in': linked}).delete()
+        if linked and on_deleted is not None:
+            on_deleted(linked)
+        statuses = {pk: BULK_DELETED for pk in linked}
+        default = BULK_MISSING
+
+    return Response({'results': [
+        {'id': pk, 'status': statuses.get(pk, default)} for pk in ids
+    ]})
+
+
+def shopping_cart_ingredients(user: User) -> List[dict]:
+    shopping_cart = models.Recipe.objects.filter(shopping_cart__user=user)
+
+    rows = models.Ingredient.objects.filter(
+        recipes__recipe__in=shopping_cart
+    ).values('name', 'measurement_unit').annotate(
+        amount=Sum('recipes__amount')
+    ).order_by('name')
+
+    ingredients = []
+    for row in rows:
+        quantity, unit = units.render(
+            row['amount'], row['measurement_unit'])
+        ingredients.append(
+            {'name': row['name'], 'quantity': quantity, 'unit': unit})
+    return ingredients
+
+
+def shopping_cart_csv(ingredients: List[dict]) -> HttpResponse:
+    response = HttpResponse(content_type='text/csv')
+    response[
+        'Content-Disposition'] = 'attachment; filename="cart.csv"'
+
+    if ingredients:
+        import csv
+
+        writer = csv.DictWriter(response, fieldnames=ingredients[0].keys())
+        writer.writeheader()
+        writer.writerows(ingredients)
+
+    return response
+
+
+def shopping_cart_pdf(path: str) -> FileResponse:
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename='cart.pdf',
+        content_type='application/pdf')
+
+
+def pdf_not_ready() -> Response:
+    return Response(
+        data={'errors': 'PDF is not ready yet, try again later'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+def pdf_failed() -> Response:
+    return Response(
+        data={'errors': 'Could not render the PDF, try the CSV list'},
+        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+    )
+
+
+def annotate_is_subscribed(queryset: QuerySet, user: User) -> QuerySet:
+    if not user.is_authenticated:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField()))
+    return queryset.annotate(is_subscribed=Exists(
+        models.Subscription.objects.filter(
+            user=user, subscribed_to=OuterRef('pk'))))
+
+
+class OnlyColumnsMixin:
+    """Load only the columns the serializer of the action declares."""
+
+    def get_queryset(self) -> QuerySet:
+        return serializers.only_columns(
+            super().get_queryset(), self.get_serializer_class())
+
+
+class ProfileViewSet(OnlyColumnsMixin, djoser_views.UserViewSet):
+    """djoser users endpoints with is_subscribed in the same query."""
+    pagination_class = UserPageNumberPagination
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = annotate_is_subscribed(queryset, self.request.user)
+        return queryset
+
+
+class UserViewSet(OnlyColumnsMixin, viewsets.GenericViewSet):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticated]
 
     def get_serializer_class(self):
         if self.action in ['subscriptions']:
             return serializers.UserSerializer
+        if self.action in ['feed']:
+            return serializers.RecipeSerializer
         return serializers.UserProfileSerializer
 
     @action(detail=False, name='Subscriptions')
     def subscriptions(self, request: HttpRequest) -> Response:
-        users = User.objects.filter(
-            subscribed__user=request.user)
+        users = self.get_queryset().filter(
+            subscribed__user=request.user
+        ).annotate(
+            recipes_count=Count('recipes'),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('username')
 
         page = self.paginate_queryset(users)
         if page is not None:
@@ -49,6 +242,34 @@ class UserViewSet(viewsets.GenericViewSet):
         serializer = self.get_serializer(users, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, name='Feed')
+    def feed(self, request: HttpRequest) -> Response:
+        paginator = FeedCursorPagination()
+        limit = paginator.get_page_size(request)
+        recipes = feed.get_feed(
+            request.user, limit + 1, paginator.decode_cursor(request))
+
+        next_position = None
+        if len(recipes) > limit:
+            recipes = recipes[:limit]
+            next_position = (recipes[-1].pub_date, recipes[-1].pk)
+
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(
+            request, serializer.data, next_position)
+
+    @action(detail=False, methods=['post', 'delete'], name='Bulk subscribe')
+    def bulk_subscribe(self, request: HttpRequest) -> Response:
+        return bulk_relations(
+            request,
+            models.Subscription,
+            'subscribed_to',
+            User.objects.all(),
+            invalid_ids=[request.user.pk],
+            on_created=lambda ids: feed.follow_many(request.user, ids),
+            on_deleted=lambda ids: feed.unfollow_many(request.user, ids),
+        )
+
     @action(detail=True, methods=['post', 'delete'], name='Subscribe')
     def subscribe(self, request: HttpRequest, pk: Optional[int] = None
                   ) -> Response:
@@ -64,6 +285,7 @@ class UserViewSet(viewsets.GenericViewSet):
             )
             if not created:
                 return response_400('Already subscribed!')
+            feed.follow(request.user, to_user)
 
             serializer = self.get_serializer(
                 to_user,
@@ -80,6 +302,7 @@ class UserViewSet(viewsets.GenericViewSet):
             return response_400('Not subscribed!')
 
         subscription.first().delete()
+        feed.unfollow(request.user, to_user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -88,6 +311,13 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = models.Tag.objects.all()
     pagination_class = None
 
+    def list(self, request, *args, **kwargs) -> HttpResponse:
+        return cached_json(
+            catalog.catalog_cache_key('tags'), 'tags',
+            lambda: super(TagViewSet, self).list(
+                request, *args, **kwargs).data,
+            catalog.CATALOG_CACHE_TIMEOUT)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.RecipeSerializer
@@ -104,7 +334,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return queryset
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'cook', 'similar']:
             return [AllowAny()]
         elif self.action in ['update', 'destroy', 'partial_update']:
             return [AuthorOrReadOnly()]
@@ -114,33 +344,163 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ['shopping_cart', 'favorite']:
             return serializers.RecipeShortSerializer
+        if self.action == 'cook':
+            return serializers.RecipeCoverageSerializer
+        if self.action == 'similar':
+            return serializers.RecipeSimilarSerializer
         return serializers.RecipeSerializer
 
-    @action(detail=False, methods=['get'], name='Download shopping cart')
-    def download_shopping_cart(self, request: HttpRequest) -> HttpResponse:
-        response = HttpResponse(content_type='text/csv')
-        response[
-            'Content-Disposition'] = 'attachment; filename="cart.csv"'
+    def list(self, request, *args, **kwargs) -> Response:
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = {'tags': self.tag_facets(request)}
+        return response
 
-        shopping_cart = models.Recipe.objects.filter(
-            shopping_cart__user=request.user)
+    def tag_facets(self, request: HttpRequest) -> List[dict]:
+        """Recipe counts per tag for the filters of the request."""
+        params = sorted(
+            (name, request.query_params[name])
+            for name in FACET_FILTERS + USER_FACET_FILTERS
+            if name in request.query_params)
+        if not params:
+            return facets.global_tag_facets()
+        if any(name in USER_FACET_FILTERS for name, _ in params):
+            params.append(('user', request.user.pk))
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()
+        recipes = DjangoFilterBackend().filter_queryset(
+            request, models.Recipe.objects.all(), self)
+        return facets.tag_facets(recipes, f'facets:{digest}')
+
+    def retrieve(self, request, *args, **kwargs) -> HttpResponse:
+        pk = kwargs[self.lookup_field]
+        # is_favorited and the rest are per user, anonymous ones see the same
+        if request.user.is_authenticated or not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        return cached_json(
+            # image urls are absolute
+            catalog.recipe_cache_key(int(pk), request.build_absolute_uri('/')),
+            'recipe',
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs).data,
+            catalog.RECIPE_CACHE_TIMEOUT)
+
+    @action(detail=False, methods=['get'], name='What can I cook')
+    def cook(self, request: HttpRequest) -> Response:
+        ingredient_ids = request.query_params.getlist('ingredients', [])
+        if not ingredient_ids:
+            return response_400('Ingredient list cannot be empty')
+        if not all(pk.isdigit() for pk in ingredient_ids):
+            return response_400('Ingredient ids should be int!')
+
+        limit = request.query_params.get('limit', str(COOK_DEFAULT_LIMIT))
+        if not limit.isdigit() or not 0 < int(limit) <= COOK_MAX_LIMIT:
+            return response_400(
+                f'limit should be int from 1 to {COOK_MAX_LIMIT}')
+
+        top = ingredient_index.top(map(int, ingredient_ids), int(limit))
+        recipes = serializers.only_columns(
+            models.Recipe.objects.all(), self.get_serializer_class()
+        ).in_bulk([recipe_id for recipe_id, _, _ in top])
+        ingredient_index.discard(
+            recipe_id for recipe_id, _, _ in top
+            if recipe_id not in recipes)
+
+        result = []
+        for recipe_id, matched, total in top:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched = matched
+            recipe.total = total
+            result.append(recipe)
+
+        serializer = self.get_serializer(result, many=True)
+        return Response(serializer.data)
 
-        ingredients = models.Ingredient.objects.filter(
-            recipes__recipe__in=shopping_cart
-        ).annotate(
-            quantity=Sum('recipes__amount')
-        ).values('name', 'quantity', unit=F('measurement_unit'))
-        if ingredients.exists():
-            writer = csv.DictWriter(response, fieldnames=ingredients[0].keys())
-            writer.writeheader()
-            writer.writerows(ingredients)
+    @action(detail=True, methods=['get'], name='Similar recipes')
+    def similar(self, request: HttpRequest, pk=None) -> Response:
+        limit = request.query_params.get('limit', str(SIMILAR_DEFAULT_LIMIT))
+        if not limit.isdigit() or not 0 < int(limit) <= TOP_K:
+            return response_400(f'limit should be int from 1 to {TOP_K}')
+        recipe = get_object_or_404(models.Recipe.objects.only('id'), pk=pk)
+
+        top = similar_recipes(recipe.pk)
+        recipes = serializers.only_columns(
+            models.Recipe.objects.all(), self.get_serializer_class()
+        ).in_bulk([recipe_id for recipe_id, _ in top])
+        similarity_index.discard(
+            recipe_id for recipe_id, _ in top if recipe_id not in recipes)
+
+        result = []
+        for recipe_id, similarity in top:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.similarity = round(similarity, 4)
+            result.append(recipe)
+            if len(result) == int(limit):
+                break
+
+        serializer = self.get_serializer(result, many=True)
+        return Response(serializer.data)
 
-        return response
+    @action(detail=False, methods=['get'], name='Download shopping cart')
+    def download_shopping_cart(self, request: HttpRequest) -> HttpResponse:
+        return shopping_cart_csv(shopping_cart_ingredients(request.user))
+
+    @action(detail=False, methods=['get'],
+            url_path='download_shopping_cart/pdf',
+            name='Download shopping cart PDF')
+    def download_shopping_cart_pdf(self, request: HttpRequest
+                                   ) -> HttpResponse:
+        ingredients = shopping_cart_ingredients(request.user)
+        for _ in range(pdf.RENDER_ATTEMPTS):
+            path, rendering = pdf.shopping_list_pdf(
+                request.user.pk, ingredients)
+            if rendering is None:
+                return shopping_cart_pdf(path)
+            try:
+                rendering.result(timeout=settings.PDF_RENDER_TIMEOUT)
+                return shopping_cart_pdf(path)
+            except futures.TimeoutError:
+                return pdf_not_ready()
+            except futures.BrokenExecutor:
+                # a pool process died, the next attempt gets a new pool
+                continue
+            except Exception:
+                # logged by pdf
+                break
+        return pdf_failed()
+
+    @action(detail=False, methods=['post', 'delete'],
+            name='Bulk shopping cart')
+    def bulk_shopping_cart(self, request: HttpRequest) -> Response:
+        return bulk_relations(
+            request,
+            models.ShoppingCart,
+            'recipe',
+            models.Recipe.objects.all(),
+            on_created=lambda ids: bump_popularity(
+                ids, SHOPPING_CART_WEIGHT),
+            on_deleted=lambda ids: bump_popularity(
+                ids, -SHOPPING_CART_WEIGHT),
+        )
+
+    @action(detail=False, methods=['post', 'delete'], name='Bulk favorite')
+    def bulk_favorite(self, request: HttpRequest) -> Response:
+        return bulk_relations(
+            request,
+            models.FavoriteRecipe,
+            'recipe',
+            models.Recipe.objects.all(),
+            on_created=lambda ids: bump_popularity(ids, FAVORITE_WEIGHT),
+            on_deleted=lambda ids: bump_popularity(ids, -FAVORITE_WEIGHT),
+        )
 
     @action(detail=True, methods=['post', 'delete'], name='Shopping cart')
     def shopping_cart(self, request: HttpRequest, pk: Optional[int] = None
                       ) -> Response:
-        recipe = get_object_or_404(models.Recipe, pk=pk)
+        recipe = get_object_or_404(serializers.only_columns(
+            models.Recipe.objects.all(), self.get_serializer_class()), pk=pk)
         if request.method == 'POST':
             shopping_cart, created = models.ShoppingCart.objects.get_or_create(
                 user=request.user,
@@ -148,6 +508,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
             if not created:
                 return response_400('Recipe already in shopping cart!')
+            bump_popularity([recipe.pk], SHOPPING_CART_WEIGHT)
 
             serializer = self.get_serializer(
                 recipe,
@@ -164,12 +525,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return response_400('No such recipe in shopping cart!')
 
         shopping_cart.first().delete()
+        bump_popularity([recipe.pk], -SHOPPING_CART_WEIGHT)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post', 'delete'], name='Favorite')
     def favorite(self, request: HttpRequest, pk: Optional[int] = None
                  ) -> Response:
-        recipe = get_object_or_404(models.Recipe, pk=pk)
+        recipe = get_object_or_404(serializers.only_columns(
+            models.Recipe.objects.all(), self.get_serializer_class()), pk=pk)
         if request.method == 'POST':
             favorite, created = models.FavoriteRecipe.objects.get_or_create(
                 user=request.user,
@@ -177,6 +540,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
             if not created:
                 return response_400('Recipe already in favorites!')
+            bump_popularity([recipe.pk], FAVORITE_WEIGHT)
 
             serializer = self.get_serializer(
                 recipe,
@@ -193,6 +557,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return response_400('No such recipe in favorites!')
 
         shopping_cart.first().delete()
+        bump_popularity([recipe.pk], -FAVORITE_WEIGHT)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -202,3 +567,29 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (SearchFilter,)
     search_fields = ('^name',)
     pagination_class = None
+
+    def list(self, request, *args, **kwargs) -> HttpResponse:
+        return cached_json(
+            catalog.catalog_cache_key(
+                'ingredients',
+                request.query_params.get(SearchFilter.search_param, '')),
+            'ingredients',
+            lambda: super(IngredientViewSet, self).list(
+                request, *args, **kwargs).data,
+            catalog.CATALOG_CACHE_TIMEOUT)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request: HttpRequest) -> Response:
+    """Connection pool statistics of the worker serving the request."""
+    return Response(pool_stats())
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Metrics in Prometheus text exposition format."""
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    body, content_type = metrics.export()
+    return HttpResponse(body, content_type=content_type)
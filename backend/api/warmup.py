@@ -0,0 +1,184 @@
+"""Filling of caches and database buffers before requests need them.
+
+warm_up() runs the steps in order until its time budget is spent:
+cached catalog responses (tags, all ingredients, ingredients by the
+first letter typed in the search), the in-process ingredient and
+similarity indexes, anonymous details of the recipes on the first
+pages of the recipe list, and finally the PostgreSQL buffers of the
+hot tables and their indexes. Caches are per process unless a shared
+CACHE_BACKEND is set, so the in-process steps only help the process
+running them, see ApiConfig.ready.
+"""
+import logging
+import time
+from typing import Callable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.functions import Lower, Substr
+from django.test import RequestFactory
+
+from food import catalog, models
+from food.ingredient_index import ingredient_index
+from food.similar import similarity_index
+from . import serializers
+from .views import RecipeViewSet, store_json
+
+logger = logging.getLogger(__name__)
+
+HOT_TABLES = (
+    'food_recipe', 'food_recipetag', 'food_recipeingredient',
+    'food_ingredient', 'food_tag', 'food_user', 'authtoken_token',
+)
+
+Step = Tuple[str, int, float]
+
+
+def _cache_missing(key: str, build: Callable[[], object]) -> int:
+    if cache.get(key) is not None:
+        return 0
+    store_json(key, build(), catalog.CATALOG_CACHE_TIMEOUT)
+    return 1
+
+
+def warm_catalog() -> int:
+    """Cache the tag list and the whole ingredient catalog if missing.
+
+    Returns the number of responses rendered.
+    """
+    return _cache_missing(
+        catalog.catalog_cache_key('tags'),
+        lambda: serializers.TagSerializer(
+            models.Tag.objects.all(), many=True).data,
+    ) + _cache_missing(
+        catalog.catalog_cache_key('ingredients', ''),
+        lambda: serializers.IngredientSerializer(
+            models.Ingredient.objects.all(), many=True).data,
+    )
+
+
+def warm_ingredient_prefixes(deadline: float) -> int:
+    """Cache ingredient searches by every first letter of a name."""
+    letters = models.Ingredient.objects.annotate(
+        letter=Lower(Substr('name', 1, 1))
+    ).values_list('letter', flat=True).distinct().order_by('letter')
+    rendered = 0
+    for letter in letters:
+        if time.monotonic() > deadline:
+            break
+        # the same queryset as SearchFilter with search_fields '^name'
+        rendered += _cache_missing(
+            catalog.catalog_cache_key('ingredients', letter),
+            lambda: serializers.IngredientSerializer(
+                models.Ingredient.objects.filter(
+                    name__istartswith=letter), many=True).data)
+    return rendered
+
+
+def warm_indexes() -> int:
+    ingredient_index.refresh()
+    similarity_index.refresh()
+    return 2
+
+
+def warm_recipe_details(pages: int, host: str, deadline: float) -> int:
+    """Cache details of the recipes on the first pages of the list.
+
+    The list itself is not cached, its pages only find the recipes and
+    read their rows into the database buffers. host is the Host header
+    of the requests, a part of the cache keys of recipe details since
+    their image urls are absolute.
+    """
+    factory = RequestFactory(HTTP_HOST=host)
+    list_view = RecipeViewSet.as_view({'get': 'list'})
+    detail_view = RecipeViewSet.as_view({'get': 'retrieve'})
+    requests = 0
+    for page in range(1, pages + 1):
+        if time.monotonic() > deadline:
+            break
+        response = list_view(
+            factory.get('/api/recipes/', {
+                'page': page, 'limit': settings.WARMUP_PAGE_SIZE}))
+        requests += 1
+        if response.status_code != 200:
+            break
+        for recipe in response.data['results']:
+            if time.monotonic() > deadline:
+                return requests
+            detail_view(
+                factory.get(f'/api/recipes/{recipe["id"]}/'),
+                pk=str(recipe['id']))
+            requests += 1
+        if not response.data['next']:
+            break
+    return requests
+
+
+def warm_buffers(deadline: float) -> int:
+    """Load hot tables and indexes into PostgreSQL shared buffers.
+
+    Uses pg_prewarm if the extension is installed, otherwise reads the
+    relations with sequential scans, which also fills the OS cache.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm'")
+        prewarm = cursor.fetchone() is not None
+        cursor.execute(
+            'SELECT indexname FROM pg_indexes WHERE tablename = ANY(%s)',
+            [list(HOT_TABLES)])
+        indexes = [name for name, in cursor.fetchall()]
+        relations = 0
+        for name in indexes + list(HOT_TABLES):
+            if time.monotonic() > deadline:
+                break
+            if prewarm:
+                cursor.execute('SELECT pg_prewarm(%s::regclass)', [name])
+            elif name in HOT_TABLES:
+                cursor.execute(
+                    f'SELECT count(*) FROM {connection.ops.quote_name(name)}')
+            else:
+                continue
+            relations += 1
+    return relations
+
+
+def warm_catalog_caches() -> int:
+    """Re-render missing catalog responses, for the periodic job.
+
+    Only the cheap steps of warm_up(): recipe details expire within
+    RECIPE_CACHE_TIMEOUT and buffers are only filled by pg_prewarm, so
+    those run on deploy and worker start only.
+    """
+    deadline = time.monotonic() + settings.WARMUP_BUDGET
+    return warm_catalog() + warm_ingredient_prefixes(deadline)
+
+
+def warm_up(pages: int = None, budget: float = None,
+            host: str = None) -> List[Step]:
+    """Run the warm-up steps, return (step, items, seconds) of each."""
+    pages = settings.WARMUP_PAGES if pages is None else pages
+    budget = settings.WARMUP_BUDGET if budget is None else budget
+    host = host or settings.WARMUP_HOST
+    deadline = time.monotonic() + budget
+    steps = (
+        ('catalog', warm_catalog),
+        ('ingredient prefixes', lambda: warm_ingredient_prefixes(deadline)),
+        ('indexes', warm_indexes),
+        ('recipe details',
+         lambda: warm_recipe_details(pages, host, deadline)),
+        ('database buffers', lambda: warm_buffers(deadline)),
+    )
+    done = []
+    for name, step in steps:
+        if time.monotonic() > deadline:
+            logger.info('Warm-up budget of %ss spent before %s',
+                        budget, name)
+            break
+        started = time.monotonic()
+        items = step()
+        done.append((name, items, time.monotonic() - started))
+    return done
@@ -41,13 +41,13 @@ INSTALLED_APPS = [
     'django_filters',
     'djoser',
     'core',
-    'food',
+    'food.apps.FoodConfig',
     'api',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.MeteredTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.MyPageNumberPagination',
     'SEARCH_PARAM': 'name',
@@ -84,7 +84,11 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.SamplingProfilerMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -113,6 +117,50 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# bearer token required by /api/metrics, empty - no authentication
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# serve slow I/O-bound endpoints by async views, set by backend.asgi
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == '1'
+
+# printable shopping lists, see api.pdf
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', 2))
+PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', 30))
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', '/tmp/foodgram-pdf')
+PDF_CACHE_MAX_AGE = int(os.getenv('PDF_CACHE_MAX_AGE', 24 * 60 * 60))
+PDF_FONT = os.getenv(
+    'PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# sampling profiler of slow requests, see core.profiling
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED') == '1'
+PROFILER_THRESHOLD_MS = float(os.getenv('PROFILER_THRESHOLD_MS', 1000))
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 5))
+PROFILER_DIR = os.getenv('PROFILER_DIR', '/tmp/foodgram-profiles')
+PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 200))
+
+# periodic maintenance jobs, see core.scheduler and core.jobs
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED') == '1'
+# leader election: file - flock, one host; db - PostgreSQL advisory lock
+SCHEDULER_LOCK = os.getenv('SCHEDULER_LOCK', 'file')
+SCHEDULER_LOCK_FILE = os.getenv(
+    'SCHEDULER_LOCK_FILE', '/tmp/foodgram-scheduler.lock')
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 2))
+ORPHANED_MEDIA_MIN_AGE = int(os.getenv('ORPHANED_MEDIA_MIN_AGE', 24 * 60 * 60))
+# tokens older than this many seconds are pruned, 0 - tokens never expire
+AUTH_TOKEN_MAX_AGE = int(os.getenv('AUTH_TOKEN_MAX_AGE', 0))
+
+# cache and database warm-up, see api.warmup
+WARMUP_ON_START = os.getenv('WARMUP_ON_START') == '1'
+WARMUP_BUDGET = float(os.getenv('WARMUP_BUDGET', 20))
+WARMUP_PAGES = int(os.getenv('WARMUP_PAGES', 10))
+# page size of the frontend recipe list
+WARMUP_PAGE_SIZE = int(os.getenv('WARMUP_PAGE_SIZE', 6))
+# Host header of the site, image urls in cached recipes are absolute
+WARMUP_HOST = os.getenv('WARMUP_HOST', 'localhost')
+# set by gunicorn.conf.py when workers fork from a preloaded master
+PRELOAD_APP = os.getenv('PRELOAD_APP') == '1'
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
@@ -130,7 +178,48 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER') or 'postgres',
         'PASSWORD': os.getenv('POSTGRES_PASSWORD') or '',
         'HOST': os.getenv('DB_HOST') or 'db',
-        'PORT': os.getenv('DB_PORT') or '5432'
+        'PORT': os.getenv('DB_PORT') or '5432',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE') or 60),
+        # used by core.db.backends.postgresql only
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL_MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE') or 0),
+        'POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT') or 10),
+    }
+}
+
+# Read replicas: comma separated hosts (and/or database names, e.g. two
+# SQLite files locally), all other settings are the same as 'default'
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host]
+DB_REPLICA_NAMES = [
+    name for name in os.getenv('DB_REPLICA_NAMES', '').split(',') if name]
+
+DATABASE_REPLICAS = []
+for number in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    alias = f'replica{number + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if number < len(DB_REPLICA_HOSTS):
+        DATABASES[alias]['HOST'] = DB_REPLICA_HOSTS[number]
+    if number < len(DB_REPLICA_NAMES):
+        DATABASES[alias]['NAME'] = DB_REPLICA_NAMES[number]
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db.routers.PrimaryReplicaRouter']
+
+# seconds a client reads from the primary after a write
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.getenv('DB_REPLICA_PIN_SECONDS') or 5)
+
+# shared between workers for anything but the default local memory cache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -165,6 +254,8 @@ USE_L10N = True
 
 USE_TZ = True
 
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
@@ -10,7 +10,11 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+# import the views now rather than on the first request, so preloading
+# workers fork with them, see gunicorn.conf.py
+get_resolver().url_patterns
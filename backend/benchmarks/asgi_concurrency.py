@@ -0,0 +1,73 @@
+"""Concurrency of slow endpoints under WSGI and ASGI servers.
+
+Starts one sync gunicorn worker and one uvicorn worker serving
+backend.asgi with the async views, then requests the same endpoint
+from many concurrent clients:
+
+    DB_ENGINE=django.db.backends.sqlite3 DB_NAME=db.sqlite3 \\
+        python -m benchmarks.asgi_concurrency --clients 32
+
+Use a local database filled with load_csv, the first user's token is
+used for authentication.
+"""
+import argparse
+import os
+import subprocess
+
+from benchmarks.common import (
+    BACKEND_DIR, http_caller, print_table, run_threads, setup_django,
+    wait_for_server)
+
+SERVERS = {
+    'wsgi (gunicorn sync)': [
+        'gunicorn', 'backend.wsgi:application',
+        '--workers', '1', '--bind', '127.0.0.1:{port}',
+    ],
+    'asgi (uvicorn)': [
+        'uvicorn', 'backend.asgi:application',
+        '--workers', '1', '--port', '{port}', '--no-access-log',
+    ],
+}
+
+
+def get_token() -> str:
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    user = get_user_model().objects.order_by('pk').first()
+    token, _ = Token.objects.get_or_create(user=user)
+    return token.key
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--path', default='/api/recipes/download_shopping_cart/')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Token {get_token()}'}
+    url = f'http://127.0.0.1:{args.port}{args.path}'
+
+    rows = {}
+    for name, command in SERVERS.items():
+        server = subprocess.Popen(
+            [part.format(port=args.port) for part in command],
+            cwd=BACKEND_DIR, env=os.environ,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_server(url)
+            rows[name] = run_threads(
+                http_caller(url, headers), args.clients, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Helpers shared by the benchmark scripts.
+
+Benchmarks are plain scripts run from the backend directory, e.g.
+``python -m benchmarks.db_pool``. They use the regular DB_* environment
+variables, so point them to a local database, never to production.
+"""
+import io
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Dict, List, Sequence
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+
+def wsgi_caller(path: str, headers: Dict[str, str] = None
+                ) -> Callable[[], int]:
+    """Callable making one request through the real WSGI handler.
+
+    Unlike django.test.Client this fires request_started/finished with
+    close_old_connections, so connection handling is the production one.
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    path, _, query = path.partition('?')
+    base_environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        base_environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    def call() -> int:
+        status = []
+        environ = dict(base_environ, **{'wsgi.input': io.BytesIO()})
+        response = handler(
+            environ, lambda s, h, exc_info=None: status.append(s))
+        for _ in response:
+            pass
+        response.close()
+        return int(status[0].split()[0])
+
+    return call
+
+
+def http_caller(url: str, headers: Dict[str, str] = None,
+                method: str = 'GET') -> Callable[[], int]:
+    """Callable making one request to a running server."""
+    def call() -> int:
+        request = urllib.request.Request(
+            url, headers=headers or {}, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    return call
+
+
+def wait_for_server(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def run_threads(call: Callable[[], int], threads: int, seconds: float
+                ) -> Dict[str, float]:
+    """Call call() from threads for seconds, return rps and latencies."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def worker():
+        local, failed = [], 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = call() < 500
+            except Exception:
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.monotonic()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return summarize(latencies, errors[0], elapsed)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float
+              ) -> Dict[str, float]:
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+COLUMNS = ('requests', 'errors', 'rps', 'p50_ms', 'p99_ms')
+
+
+def print_table(rows: Dict[str, Dict[str, float]],
+                columns: Sequence[str] = COLUMNS, title: str = 'scenario'):
+    width = max(len(name) for name in list(rows) + [title]) + 2
+    print(title.ljust(width) + ''.join(c.rjust(10) for c in columns))
+    for name, row in rows.items():
+        print(name.ljust(width) + ''.join(
+            f'{row[c]:10.1f}' if isinstance(row[c], float)
+            else f'{row[c]:10d}' for c in columns))
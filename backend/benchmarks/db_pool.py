@@ -0,0 +1,81 @@
+"""Requests per second with and without connection reuse and pooling.
+
+Needs a local PostgreSQL configured by the DB_* variables:
+
+    DB_HOST=localhost POSTGRES_PASSWORD=... python -m benchmarks.db_pool
+
+Every scenario runs in its own process, because database settings are
+read once at django.setup().
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import (
+    BACKEND_DIR, print_table, run_threads, setup_django, wsgi_caller)
+
+SCENARIOS = {
+    'new connection': {
+        'DB_ENGINE': 'django.db.backends.postgresql',
+        'DB_CONN_MAX_AGE': '0',
+    },
+    'persistent': {
+        'DB_ENGINE': 'django.db.backends.postgresql',
+        'DB_CONN_MAX_AGE': '600',
+    },
+    'persistent + health checks': {
+        'DB_ENGINE': 'core.db.backends.postgresql',
+        'DB_CONN_MAX_AGE': '600',
+        'DB_CONN_HEALTH_CHECKS': '1',
+    },
+    'pool': {
+        'DB_ENGINE': 'core.db.backends.postgresql',
+        'DB_CONN_MAX_AGE': '0',
+        'DB_CONN_HEALTH_CHECKS': '0',
+        'DB_POOL_MAX_SIZE': '4',
+    },
+}
+
+
+def run_scenario(args):
+    setup_django()
+    from core.db.pool import pool_stats
+
+    result = run_threads(wsgi_caller(args.path), args.threads, args.seconds)
+    result['pool'] = pool_stats()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--path', default='/api/tags/')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--scenario', choices=SCENARIOS,
+                        help='run a single scenario in this process')
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args)
+        return
+
+    rows = {}
+    for name, env in SCENARIOS.items():
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.db_pool',
+             '--scenario', name, '--path', args.path,
+             '--threads', str(args.threads), '--seconds', str(args.seconds)],
+            cwd=BACKEND_DIR, env={**os.environ, **env},
+            check=True, stdout=subprocess.PIPE, universal_newlines=True,
+        ).stdout
+        rows[name] = json.loads(output.strip().splitlines()[-1])
+    print_table(rows)
+    for name, row in rows.items():
+        if row['pool']:
+            print(f'{name} pool stats: {row["pool"]}')
+
+
+if __name__ == '__main__':
+    main()
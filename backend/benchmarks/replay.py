@@ -0,0 +1,188 @@
+"""Replay of nginx access logs against a local server.
+
+Reads logs in the combined format written by infra/nginx.conf (plain or
+gzipped, rotated files in any order), keeps the GET and HEAD requests
+to /api/ and sends them to --url with their original spacing divided by
+--speedup, from a pool of --clients threads:
+
+    python -m benchmarks.replay access.log.2.gz access.log.1 access.log \\
+        --url http://127.0.0.1:8000 --speedup 10 --clients 32
+
+Request bodies and tokens are not logged, so writes are skipped and
+requests are anonymous unless --auth sends the first user's token.
+Requests are grouped into endpoints by the view they resolve to, e.g.
+'GET recipes-list'. 4xx responses are not errors, anonymous requests
+to user endpoints get 401. lag99 is how late requests started because
+the pool was busy; if it grows, add clients or lower the speedup.
+"""
+import argparse
+import gzip
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from benchmarks.common import (
+    http_caller, percentile, print_table, setup_django)
+
+# log_format combined
+LINE = re.compile(
+    r'(?P<remote_addr>\S+) - (?P<remote_user>\S+) '
+    r'\[(?P<time_local>[^\]]+)\] "(?P<method>[A-Z]+) (?P<uri>\S+) [^"]*" '
+    r'(?P<status>\d{3}) ')
+TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+METHODS = ('GET', 'HEAD')
+COLUMNS = ('requests', 'errors', 'err_%', '4xx', 'p50_ms', 'p90_ms',
+           'p99_ms', 'max_ms', 'lag99_ms')
+
+Request = Tuple[float, str, str, str]
+
+
+def read_lines(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as file:
+            yield from file
+
+
+def endpoint(method: str, path: str) -> str:
+    """'GET recipes-detail' for /api/recipes/1/, the path if unresolved."""
+    from django.urls import Resolver404, resolve
+
+    try:
+        return f'{method} {resolve(path).view_name}'
+    except Resolver404:
+        return f'{method} {re.sub(r"/[0-9]+/", "/{id}/", path)}'
+
+
+def parse(lines: Iterable[str]) -> Tuple[List[Request], Dict[str, int]]:
+    """(offset seconds, method, uri, endpoint) of the replayed requests.
+
+    Offsets are relative to the first request. The log has a resolution
+    of a second, requests of one second are spread evenly over it.
+    """
+    skipped = defaultdict(int)
+    seconds: Dict[float, List[Tuple[str, str, str]]] = defaultdict(list)
+    for line in lines:
+        match = LINE.match(line)
+        if match is None:
+            skipped['unparsed'] += 1
+            continue
+        method, uri = match['method'], match['uri']
+        if not uri.startswith('/api/') or uri.startswith('/api/docs/'):
+            skipped['not api'] += 1
+            continue
+        if method not in METHODS:
+            skipped['writes'] += 1
+            continue
+        timestamp = datetime.strptime(
+            match['time_local'], TIME_FORMAT).timestamp()
+        seconds[timestamp].append(
+            (method, uri, endpoint(method, uri.partition('?')[0])))
+    requests = []
+    start = min(seconds, default=0)
+    for timestamp in sorted(seconds):
+        batch = seconds[timestamp]
+        for number, (method, uri, name) in enumerate(batch):
+            requests.append(
+                (timestamp - start + number / len(batch), method, uri, name))
+    return requests, skipped
+
+
+def replay(requests: List[Request], url: str, headers: Dict[str, str],
+           speedup: float, clients: int) -> Dict[str, List[tuple]]:
+    """Send the requests, return (status, latency, lag) per endpoint."""
+    results: Dict[str, List[tuple]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def send(due: float, method: str, uri: str, name: str):
+        started = time.perf_counter()
+        try:
+            status = http_caller(url + uri, headers, method)()
+        except Exception:
+            status = 0
+        latency = time.perf_counter() - started
+        with lock:
+            results[name].append((status, latency, max(0, started - due)))
+
+    with ThreadPoolExecutor(clients) as executor:
+        began = time.perf_counter()
+        for offset, method, uri, name in requests:
+            due = began + (offset / speedup if speedup else 0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, due, method, uri, name)
+    return results
+
+
+def report(results: Dict[str, List[tuple]]) -> Dict[str, dict]:
+    rows = {}
+    everything = []
+    for name in sorted(results, key=lambda n: -len(results[n])):
+        rows[name] = summarize(results[name])
+        everything.extend(results[name])
+    rows['total'] = summarize(everything)
+    return rows
+
+
+def summarize(results: List[tuple]) -> dict:
+    """Errors are failed connections and 5xx responses."""
+    latencies = [latency for _, latency, _ in results]
+    errors = sum(1 for status, _, _ in results if not 0 < status < 500)
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'err_%': errors / len(results) * 100 if results else 0.0,
+        '4xx': sum(1 for status, _, _ in results if 400 <= status < 500),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+        'lag99_ms': percentile([lag for _, _, lag in results], 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        'logs', nargs='+', help='Access logs, plain or gzipped')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument(
+        '--speedup', type=float, default=1,
+        help='Replay this many times faster, 0 for no pauses')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument(
+        '--limit', type=int, default=0, help='Replay only N requests')
+    parser.add_argument(
+        '--auth', action='store_true',
+        help="Send the first user's token with every request")
+    args = parser.parse_args()
+
+    setup_django()
+    requests, skipped = parse(read_lines(args.logs))
+    if args.limit:
+        requests = requests[:args.limit]
+    headers = {}
+    if args.auth:
+        from benchmarks.asgi_concurrency import get_token
+
+        headers['Authorization'] = f'Token {get_token()}'
+
+    duration = requests[-1][0] if requests else 0
+    print(f'Replaying {len(requests)} requests logged over '
+          f'{duration:.0f}s, skipped: {dict(skipped) or "none"}')
+    started = time.monotonic()
+    results = replay(
+        requests, args.url.rstrip('/'), headers, args.speedup, args.clients)
+    print(f'Done in {time.monotonic() - started:.1f}s.')
+    print_table(report(results), COLUMNS, title='endpoint')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Startup time of the application, its commands and its servers.
+
+Every scenario runs in fresh interpreters, so nothing is imported yet:
+
+    DB_ENGINE=django.db.backends.sqlite3 DB_NAME=db.sqlite3 \\
+        python -m benchmarks.startup --runs 5 --imports 15
+
+The gunicorn scenarios measure the time from starting the server to
+its first response, with the application preloaded by the master and
+imported by every worker. --imports also prints the packages and the
+modules slowest to import by backend.wsgi, taken from -X importtime.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks.common import BACKEND_DIR, wait_for_server
+
+SETTINGS = "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', " \
+    "'backend.settings'); "
+
+COMMANDS = {
+    'django.setup()': [
+        sys.executable, '-c', SETTINGS + 'import django; django.setup()'],
+    'import backend.wsgi': [
+        sys.executable, '-c', 'import backend.wsgi'],
+    'manage.py check': [
+        sys.executable, 'manage.py', 'check'],
+    'manage.py run_scheduler --list': [
+        sys.executable, 'manage.py', 'run_scheduler', '--list'],
+}
+
+GUNICORN = [
+    'gunicorn', 'backend.wsgi:application',
+    '--workers', '{workers}', '--bind', '127.0.0.1:{port}',
+]
+
+
+def run_command(command: List[str]) -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        command, cwd=BACKEND_DIR, env=os.environ, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def run_gunicorn(preload: bool, workers: int, port: int) -> float:
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0')
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [part.format(workers=workers, port=port) for part in GUNICORN],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(f'http://127.0.0.1:{port}/api/tags/', timeout=60)
+        return time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self, cumulative) microseconds of importing module."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=os.environ, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times.append((name.strip(), int(own), int(cumulative)))
+    return times
+
+
+def print_imports(times: List[Tuple[str, int, int]], top: int):
+    packages: Dict[str, int] = defaultdict(int)
+    for name, own, _ in times:
+        packages[name.split('.')[0]] += own
+    print(f'\n{"package":40}{"self_ms":>10}')
+    for name, own in sorted(
+            packages.items(), key=lambda item: -item[1])[:top]:
+        print(f'{name:40}{own / 1000:10.1f}')
+    print(f'\n{"module":40}{"self_ms":>10}{"total_ms":>10}')
+    for name, own, cumulative in sorted(times, key=lambda t: -t[1])[:top]:
+        print(f'{name:40}{own / 1000:10.1f}{cumulative / 1000:10.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument(
+        '--imports', type=int, default=0, metavar='N',
+        help='Print the N slowest imported packages and modules')
+    parser.add_argument(
+        '--no-servers', action='store_true',
+        help='Skip the gunicorn scenarios')
+    args = parser.parse_args()
+
+    scenarios = {
+        name: lambda command=command: run_command(command)
+        for name, command in COMMANDS.items()
+    }
+    if not args.no_servers:
+        for preload in (True, False):
+            name = (f'gunicorn first response '
+                    f'(preload {"on" if preload else "off"})')
+            scenarios[name] = lambda preload=preload: run_gunicorn(
+                preload, args.workers, args.port)
+
+    width = max(len(name) for name in scenarios) + 2
+    print('scenario'.ljust(width) + ''.join(
+        c.rjust(10) for c in ('min_ms', 'median_ms', 'max_ms')))
+    for name, scenario in scenarios.items():
+        seconds = [scenario() for _ in range(args.runs)]
+        print(name.ljust(width) + ''.join(
+            f'{value * 1000:10.1f}' for value in (
+                min(seconds), statistics.median(seconds), max(seconds))))
+
+    if args.imports:
+        print_imports(import_times('backend.wsgi'), args.imports)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""gzip and brotli compression of responses negotiated by Accept-Encoding.
+
+brotli is used when the brotli package is installed. Responses carrying
+a ``precompressed`` dict (encoding -> body), see compress_variants(),
+are sent as is; other responses are compressed on the fly.
+"""
+import asyncio
+import gzip
+import io
+import re
+from typing import Dict, Optional
+
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = 860
+# bodies compressed once for the cache get the slowest, best levels
+GZIP_LEVEL = 6
+GZIP_CACHED_LEVEL = 9
+BROTLI_QUALITY = 5
+BROTLI_CACHED_QUALITY = 11
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript',
+                      'application/xml', 'application/openapi')
+
+ACCEPT_ENCODING_RE = _lazy_re_compile(
+    r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*(?:,|$)')
+STRONG_ETAG_RE = re.compile(r'^"')
+
+
+def encodings() -> tuple:
+    """Supported encodings, preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for name, quality in ACCEPT_ENCODING_RE.findall(accept_encoding or ''):
+        try:
+            accepted[name.lower()] = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+    default = accepted.get('*', 0)
+    best, best_quality = None, 0
+    for encoding in encodings():
+        quality = accepted.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(
+            body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    # mtime=0 keeps the output, and so ETags, stable; gzip.compress()
+    # takes mtime since Python 3.8 only, the image runs 3.7
+    buffer = io.BytesIO()
+    with gzip.GzipFile(
+            fileobj=buffer, mode='wb', mtime=0,
+            compresslevel=GZIP_CACHED_LEVEL if cached else GZIP_LEVEL) as file:
+        file.write(body)
+    return buffer.getvalue()
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Every supported compressed variant of a body that will be cached."""
+    if len(body) < MIN_SIZE:
+        return {}
+    return {encoding: compress(body, encoding, cached=True)
+            for encoding in encodings()}
+
+
+class CompressionMiddleware:
+    """Compress responses like GZipMiddleware, with brotli and cached
+    variants."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # same switch to async mode as in MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def process_response(self, request, response):
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith(
+                    COMPRESSIBLE_TYPES)):
+            return response
+        precompressed = getattr(response, 'precompressed', None) or {}
+        if not precompressed and len(response.content) < MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+        body = precompressed.get(encoding)
+        if body is None:
+            body = compress(response.content, encoding)
+        if len(body) >= len(response.content):
+            return response
+
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        # the compressed body differs byte for byte, as in GZipMiddleware
+        etag = response.get('ETag')
+        if etag and STRONG_ETAG_RE.match(etag):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
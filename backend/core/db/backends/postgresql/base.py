@@ -0,0 +1,101 @@
+"""PostgreSQL backend with connection health checks and optional pool.
+
+Extra DATABASES keys (ignored by the stock backend):
+
+* CONN_HEALTH_CHECKS: ping a reused persistent connection with
+  SELECT 1 before its first query in a request and reconnect if the
+  server dropped it.
+* POOL_MAX_SIZE: when > 0 connections are taken from and returned to
+  an in-process pool shared by all threads of the worker instead of
+  being opened and closed. Use with CONN_MAX_AGE = 0.
+* POOL_TIMEOUT: seconds to wait for a free pooled connection.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, PoolTimeout, pools, pools_lock
+
+
+def _is_broken(conn) -> bool:
+    if conn.closed:
+        return True
+    status = conn.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_IDLE:
+        return False
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return True
+    # left in a transaction, roll it back before handing out again
+    try:
+        conn.rollback()
+    except base.Database.Error:
+        return True
+    return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            'CONN_HEALTH_CHECKS', False)
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        max_size = self.settings_dict.get('POOL_MAX_SIZE') or 0
+        if max_size <= 0:
+            return None
+        pool = pools.get(self.alias)
+        if pool is None:
+            with pools_lock:
+                pool = pools.get(self.alias)
+                if pool is None:
+                    pool = ConnectionPool(
+                        max_size=max_size,
+                        timeout=self.settings_dict.get('POOL_TIMEOUT', 10),
+                        is_broken=_is_broken,
+                    )
+                    pools[self.alias] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.getconn(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params))
+        except PoolTimeout as e:
+            raise base.Database.OperationalError(str(e)) from e
+        # a reused connection skips the isolation level setup of
+        # super().get_new_connection(), keep self.isolation_level in sync
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        # connections from the pool are healthy or freshly opened
+        self.health_check_done = True
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        if self.errors_occurred and not self.is_usable():
+            pool.discard(self.connection)
+        else:
+            pool.putconn(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        # called on request start and finish, next request checks again
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def ensure_connection(self):
+        if (self.connection is not None
+                and self.health_check_enabled
+                and not self.health_check_done
+                and not self.in_atomic_block):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
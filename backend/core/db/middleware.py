@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import use_replicas
+
+PIN_COOKIE = 'db_primary'
+PIN_CACHE_PREFIX = 'db_primary:'
+
+
+class ReplicaRoutingMiddleware:
+    """Send reads of safe requests to replicas, with read-your-writes.
+
+    After a successful unsafe request the client is pinned to the
+    primary for DATABASE_REPLICA_PIN_SECONDS, so it does not read stale
+    data from a lagging replica. The pin is kept in a cookie and, for
+    clients without cookies, in the cache by their auth token.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # same switch to async mode as in MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @staticmethod
+    def _pin_key(request):
+        credentials = (request.META.get('HTTP_AUTHORIZATION')
+                       or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if not credentials:
+            return None
+        return PIN_CACHE_PREFIX + hashlib.sha1(
+            credentials.encode()).hexdigest()
+
+    def _is_pinned(self, request) -> bool:
+        if PIN_COOKIE in request.COOKIES:
+            return True
+        key = self._pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def _pin(self, request, response):
+        seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+        key = self._pin_key(request)
+        if key is not None:
+            cache.set(key, True, seconds)
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+
+    def _route(self, request):
+        safe = request.method in SAFE_METHODS
+        return use_replicas.set(safe and not self._is_pinned(request))
+
+    def _finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self._pin(request, response)
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        token = self._route(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        return self._finish(request, response)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        token = self._route(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        return self._finish(request, response)
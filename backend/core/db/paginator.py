@@ -0,0 +1,29 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# below this many rows the exact count is cheap enough
+ESTIMATED_COUNT_MIN = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using the planner row estimate for unfiltered lists.
+
+    COUNT(*) scans the whole table on PostgreSQL, the estimate kept by
+    ANALYZE in pg_class is free. Filtered lists are counted exactly.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row is not None and row[0] >= ESTIMATED_COUNT_MIN:
+                return int(row[0])
+        return super().count
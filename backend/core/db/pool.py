@@ -0,0 +1,118 @@
+"""Thread-safe in-process pool of DB-API connections.
+
+Used by core.db.backends.postgresql when POOL_MAX_SIZE is set, so that
+threads of one gunicorn worker share a bounded number of connections.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, max_size: int, timeout: float,
+                 is_broken: Callable[[Any], bool]):
+        self._is_broken = is_broken
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: List[Any] = []
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'connections_created': 0,
+            'connections_reused': 0,
+            'connections_discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def getconn(self, connect: Callable[[], Any]):
+        """Take an idle connection or open a new one with connect()."""
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                self._stats['waits'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    if self._idle or self._size < self.max_size:
+                        break
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No free connection in the pool of '
+                        f'{self.max_size} after {self.timeout}s')
+            if self._idle:
+                self._stats['connections_reused'] += 1
+                return self._idle.pop()
+            self._size += 1
+            self._stats['connections_created'] += 1
+
+        try:
+            return connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def putconn(self, conn):
+        discard = self._is_broken(conn)
+        with self._condition:
+            if discard:
+                self._size -= 1
+                self._stats['connections_discarded'] += 1
+            else:
+                self._idle.append(conn)
+            self._condition.notify()
+        if discard:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def discard(self, conn):
+        """Drop a connection taken from the pool, e.g. a broken one."""
+        with self._condition:
+            self._size -= 1
+            self._stats['connections_discarded'] += 1
+            self._condition.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                **self._stats,
+            }
+
+
+# pools of this process by database alias
+pools: Dict[str, ConnectionPool] = {}
+pools_lock = threading.Lock()
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pools():
+    """Close idle pooled connections, e.g. before forking workers."""
+    with pools_lock:
+        for pool in pools.values():
+            pool.close_all()
@@ -0,0 +1,35 @@
+"""Primary/replica database routing.
+
+Reads go to one of settings.DATABASE_REPLICAS only inside a request
+marked as read-only by ReplicaRoutingMiddleware. Everything else, i.e.
+writes, unsafe requests, atomic blocks and management commands, uses
+the primary 'default' database.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+use_replicas: ContextVar[bool] = ContextVar('use_replicas', default=False)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas
+                or not use_replicas.get()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,23 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """Run blocking ORM code from async views in the thread pool.
+
+    sync_to_async(thread_sensitive=True), the default, serializes all
+    calls in one thread. Here every call may run in any executor thread
+    in parallel, so stale connections left in those threads are closed
+    the same way request_started/finished do for sync views.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False)
@@ -0,0 +1,38 @@
+"""Maintenance jobs run by core.scheduler, every interval seconds."""
+from django.conf import settings
+
+from .scheduler import job
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+@job(interval=HOUR, timeout=300)
+def update_tag_counts():
+    from food.facets import update_tag_counts
+    return f'{update_tag_counts()} tags updated'
+
+
+@job(interval=15 * 60, timeout=600)
+def update_recipe_scores():
+    from food.scores import update_scores
+    return update_scores()
+
+
+@job(interval=DAY, timeout=30 * 60)
+def delete_orphaned_media():
+    from food.media import delete_orphaned_media
+    files, size = delete_orphaned_media(settings.ORPHANED_MEDIA_MIN_AGE)
+    return f'{files} files, {size} bytes deleted'
+
+
+@job(interval=5 * 60, timeout=60)
+def warm_caches():
+    from api.warmup import warm_catalog_caches
+    return f'{warm_catalog_caches()} responses cached'
+
+
+@job(interval=HOUR, timeout=300)
+def prune_tokens():
+    from api.authentication import prune_tokens
+    return f'{prune_tokens()} tokens deleted'
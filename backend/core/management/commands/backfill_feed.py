@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from food import feed
+
+
+class Command(BaseCommand):
+    help = 'Fans out latest recipes of every subscription into feeds'
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        print('Backfilling feeds...')
+        print(f'Feed entries added: {feed.backfill()}')
+        print('Done.')
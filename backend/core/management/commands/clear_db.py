@@ -1,11 +1,27 @@
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from food import models
+from django.core.management.color import no_style
+from django.db import connection
+
+from food import catalog, models
+from food.media import delete_orphaned_media
 
 
 class Command(BaseCommand):
+    help = ('Truncates users, recipes, tags, ingredients and every table '
+            'referencing them')
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--purge-media', action='store_true',
+            help='Also delete media files, including the images of '
+                 'test_data used by load_csv')
 
     def handle(self, *args, **options):
-        objects_to_delete = [
+        models_to_clear = [
             models.Recipe,
             models.Tag,
             models.Ingredient,
@@ -13,11 +29,35 @@ class Command(BaseCommand):
         ]
 
         print('Clearing database...')
+        started = time.perf_counter()
+        # TRUNCATE ... RESTART IDENTITY CASCADE on PostgreSQL; DELETE of
+        # the tables and of everything referencing them plus a
+        # sqlite_sequence reset on SQLite
+        statements = connection.ops.sql_flush(
+            no_style(),
+            [model._meta.db_table for model in models_to_clear],
+            reset_sequences=True,
+            allow_cascade=True,
+        )
+        connection.ops.execute_sql_flush(statements)
+        for statement in statements:
+            print(statement)
+        print(f'Database cleared in {time.perf_counter() - started:.2f}s')
+
+        # ids start again from 1, responses cached for the old rows
+        # must not be served for the new ones
+        catalog.bump_catalog_version()
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith('LocMemCache'):
+            print('The cache is local to this process, running servers '
+                  'keep their cached responses until they restart.')
+        else:
+            print('Cached catalog and recipe responses invalidated.')
 
-        for model in objects_to_delete:
-            initial_count = model.objects.count()
-            model.objects.all().delete()
-            new_count = model.objects.count()
-            print(f'{model.__name__}: {initial_count} -> {new_count}')
+        if options['purge_media']:
+            started = time.perf_counter()
+            files, size = delete_orphaned_media()
+            print(f'Media files deleted: {files} ({size / 2**20:.1f} MB) '
+                  f'in {time.perf_counter() - started:.2f}s')
 
         print('Done.')
@@ -0,0 +1,30 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from food import transfer
+
+
+class Command(BaseCommand):
+    help = 'Exports recipes with tags and ingredients to gzipped NDJSON'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file, - for stdout')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Recipes fetched per query')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        output = sys.stdout.buffer if path == '-' else path
+        # progress goes to stderr so the export can be piped
+        print(f'Exporting recipes to {path}...', file=sys.stderr)
+        started = time.perf_counter()
+        with gzip.open(output, 'wt', encoding='utf-8') as f:
+            exported = transfer.export_recipes(f, options['chunk_size'])
+        print(f'Recipes exported: {exported} '
+              f'in {time.perf_counter() - started:.2f}s', file=sys.stderr)
+        print('Done.', file=sys.stderr)
@@ -0,0 +1,105 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food import catalog
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(f):
+    """Rows of a headerless "name,measurement_unit" file."""
+    for row in csv.reader(f):
+        if len(row) == 2:
+            yield row
+        elif row:
+            yield '', ''
+
+
+def read_json(f):
+    """Objects of a JSON array, decoded without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('Expected a JSON array')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Truncated JSON array')
+                break
+            if isinstance(item, dict):
+                yield item.get('name', ''), item.get('measurement_unit', '')
+            else:
+                yield '', ''
+        if not chunk:
+            raise CommandError('Truncated JSON array')
+
+
+class Command(BaseCommand):
+    help = ('Creates or updates ingredients from a JSON array or a '
+            'headerless name,measurement_unit CSV file (- for stdin)')
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File like data/ingredients.json')
+        parser.add_argument(
+            '--format', choices=('json', 'csv'),
+            help='File format, by default taken from the extension')
+        parser.add_argument(
+            '--batch-size', type=int, default=catalog.BATCH_SIZE,
+            help='Rows per upsert statement')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only print what would change')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path)[1].lstrip('.').lower()
+        if file_format not in ('json', 'csv'):
+            raise CommandError('Pass --format json or --format csv')
+        reader = read_json if file_format == 'json' else read_csv
+
+        print(f'Importing ingredients from {path}...')
+        started = time.perf_counter()
+        if path == '-':
+            stats = catalog.import_ingredients(
+                reader(sys.stdin), options['batch_size'],
+                options['dry_run'])
+        else:
+            with open(path, encoding='utf-8', newline='') as f:
+                stats = catalog.import_ingredients(
+                    reader(f), options['batch_size'], options['dry_run'])
+
+        for name, old, new in stats.changes:
+            if old is None:
+                print(f'+ {name}, {new}')
+            else:
+                print(f'~ {name}, {old} -> {new}')
+        changed = stats.created + stats.updated
+        if changed > len(stats.changes):
+            print(f'... and {changed - len(stats.changes)} more')
+        print(f'Created: {stats.created}, updated: {stats.updated}, '
+              f'unchanged: {stats.unchanged}, invalid: {stats.invalid} '
+              f'in {time.perf_counter() - started:.2f}s')
+        if options['dry_run']:
+            print('Dry run, nothing was written.')
+        print('Done.')
@@ -0,0 +1,48 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from food import transfer
+from food.models import User
+
+
+class Command(BaseCommand):
+    help = 'Imports recipes exported by export_recipes'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, - for stdin')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Recipes inserted per transaction')
+        parser.add_argument(
+            '--default-author',
+            help='Email of the author of recipes whose author is missing')
+
+    def handle(self, *args, **options):
+        default_author = None
+        if options['default_author']:
+            default_author = User.objects.filter(
+                email=options['default_author']).first()
+            if default_author is None:
+                raise CommandError('Default author not found')
+
+        path = options['path']
+        source = sys.stdin.buffer if path == '-' else path
+        print(f'Importing recipes from {path}...')
+        started = time.perf_counter()
+        try:
+            with gzip.open(source, 'rt', encoding='utf-8') as f:
+                stats = transfer.import_recipes(
+                    f, options['chunk_size'], default_author)
+        except ValueError as e:
+            raise CommandError(e)
+        print(f'Tags created: {stats.tags_created}')
+        print(f'Ingredients created: {stats.ingredients_created}')
+        print(f'Recipes created: {stats.created}, '
+              f'existing: {stats.existing}, '
+              f'without author: {stats.no_author} '
+              f'in {time.perf_counter() - started:.2f}s')
+        print('Done.')
@@ -16,6 +16,7 @@ User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Loads a CSV files from static/data into the database'
+    requires_system_checks = []
 
     def handle(self, *args, **options):
         files_models = {
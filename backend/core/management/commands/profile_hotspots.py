@@ -0,0 +1,69 @@
+import json
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import FOLDED_SUFFIX, META_SUFFIX
+
+
+class Command(BaseCommand):
+    help = 'Summarizes hotspots of the profiles written by the profiler'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=settings.PROFILER_DIR,
+            help='Directory with the profiles')
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Number of entries in every table')
+        parser.add_argument(
+            '--view', default='',
+            help='Only profiles of views whose name contains this')
+
+    def handle(self, *args, **options):
+        own, total = Counter(), Counter()
+        sql_time, sql_count = Counter(), Counter()
+        profiles = samples = 0
+
+        for entry in os.scandir(options['dir']):
+            if not entry.name.endswith(FOLDED_SUFFIX):
+                continue
+            base = entry.path[:-len(FOLDED_SUFFIX)]
+            try:
+                with open(base + META_SUFFIX, encoding='utf-8') as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                meta = {'view': '', 'queries': []}
+            if options['view'] not in meta['view']:
+                continue
+            profiles += 1
+            for query in meta['queries']:
+                sql_time[query['sql']] += query['ms']
+                sql_count[query['sql']] += 1
+            with open(entry.path, encoding='utf-8') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    frames = stack.split(';')
+                    count = int(count)
+                    samples += count
+                    own[frames[-1]] += count
+                    # recursive frames count once per sample
+                    for frame in set(frames):
+                        total[frame] += count
+
+        print(f'Profiles: {profiles}, samples: {samples}')
+        if not samples:
+            print('Done.')
+            return
+        top = options['top']
+        for title, counter in (('Own time', own), ('Total time', total)):
+            print(f'\n{title}:')
+            for frame, count in counter.most_common(top):
+                print(f'{count / samples:7.1%} {count:8} {frame}')
+        print('\nSQL:')
+        for sql, ms in sql_time.most_common(top):
+            print(f'{ms:10.1f}ms {sql_count[sql]:6}x {sql[:200]}')
+        print('Done.')
@@ -0,0 +1,50 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Runs the periodic maintenance jobs without the web server'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run every job once now and exit, ignoring the lock')
+        parser.add_argument(
+            '--job', action='append', default=[],
+            help='Run only this job now and exit (may be repeated)')
+        parser.add_argument(
+            '--list', action='store_true', help='List the jobs and exit')
+
+    def handle(self, *args, **options):
+        jobs = scheduler.load_jobs()
+        if options['list']:
+            for job in jobs.values():
+                print(f'{job.name}: every {job.interval}s, '
+                      f'timeout {job.timeout}s')
+            return
+
+        unknown = set(options['job']) - set(jobs)
+        if unknown:
+            raise CommandError(f'Unknown jobs: {", ".join(sorted(unknown))}')
+        names = options['job'] or (list(jobs) if options['once'] else None)
+        runner = scheduler.Scheduler(jobs.values(), len(names or jobs))
+        if names:
+            for name, result in runner.run_now(names).items():
+                print(f'{name}: {result}')
+            runner.stop()
+            print('Done.')
+            return
+
+        logging.basicConfig(
+            level=logging.INFO, format='%(asctime)s %(message)s')
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: runner.stopped.set())
+        print('Running scheduled jobs, waiting for the leader lock...')
+        runner.run()
+        runner.stop()
+        print('Done.')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from food import feed
+
+
+class Command(BaseCommand):
+    help = 'Deletes the oldest feed entries above the per-user limit'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-entries', type=int, default=feed.MAX_ENTRIES,
+            help='Entries to keep per user, 0 deletes all feeds')
+
+    def handle(self, *args, **options):
+        if options['max_entries'] < 0:
+            raise CommandError('--max-entries must not be negative')
+        print('Trimming feeds...')
+        print(f'Feed entries deleted: {feed.trim(options["max_entries"])}')
+        print('Done.')
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from food.scores import update_scores
+
+
+class Command(BaseCommand):
+    help = 'Recomputes recipe popularity and trending scores'
+    requires_system_checks = []
+
+    def handle(self, *args, **options):
+        print('Updating recipe scores...')
+        started = time.monotonic()
+        for field, count in update_scores().items():
+            print(f'{field}: {count} recipes updated')
+        print(f'Done in {time.monotonic() - started:.2f}s.')
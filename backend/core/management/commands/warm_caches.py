@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = 'Fills response caches and database buffers before traffic'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=settings.WARMUP_PAGES,
+            help='Recipe list pages to warm')
+        parser.add_argument(
+            '--budget', type=float, default=settings.WARMUP_BUDGET,
+            help='Seconds to spend at most')
+        parser.add_argument(
+            '--host', default=settings.WARMUP_HOST,
+            help='Host header of the site')
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES['default']['BACKEND']
+        if backend.endswith('LocMemCache'):
+            print('The cache is local to this process, '
+                  'only the database buffers stay warm.')
+        print('Warming up...')
+        for name, items, seconds in warm_up(
+                options['pages'], options['budget'], options['host']):
+            print(f'{name}: {items} in {seconds:.2f}s')
+        print('Done.')
@@ -0,0 +1,150 @@
+"""Prometheus metrics of the API, served at /api/metrics.
+
+With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty
+writable directory: every worker then writes its samples to mmap files
+there and the endpoint aggregates them (see gunicorn.conf.py for the
+cleanup hooks). Without it metrics of the serving process only are
+exported.
+"""
+import asyncio
+import os
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+    REGISTRY, generate_latest, multiprocess)
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Request latency by DRF view and action',
+    ['view', 'action', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_db_queries',
+    'Database queries per request by DRF view and action',
+    ['view', 'action'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'Database queries by database alias',
+    ['alias'],
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Cache lookups by cache name and result (hit or miss)',
+    ['cache', 'result'],
+)
+IMAGE_QUEUE_DEPTH = Gauge(
+    'foodgram_image_queue_depth',
+    'Uploaded images being decoded and validated',
+    multiprocess_mode='livesum',
+)
+TOKEN_AUTH_LOOKUPS = Counter(
+    'foodgram_token_auth_lookups_total',
+    'Token authentication lookups by result',
+    ['result'],
+)
+TOKEN_AUTH_LATENCY = Histogram(
+    'foodgram_token_auth_duration_seconds',
+    'Token authentication lookup latency',
+)
+SCHEDULER_JOB_DURATION = Histogram(
+    'foodgram_scheduler_job_duration_seconds',
+    'Duration of scheduled maintenance jobs by job and status',
+    ['job', 'status'],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600, float('inf')),
+)
+SCHEDULER_JOB_RUNS = Counter(
+    'foodgram_scheduler_job_runs_total',
+    'Runs of scheduled maintenance jobs by job and status',
+    ['job', 'status'],
+)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def export():
+    """Return (body, content type) of the metrics exposition."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class QueryCounter:
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        DB_QUERIES.labels(self.alias).inc()
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Measure latency and database queries of every API request.
+
+    Queries are counted on the connections of the request thread, ORM
+    calls that async views push to the thread pool are not included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # same switch to async mode as in MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        request.metrics_view = (view.__name__ if view is not None
+                                else view_func.__name__)
+        request.metrics_action = actions.get(request.method.lower(), '')
+
+    def _start(self, request):
+        stack = ExitStack()
+        counters = []
+        for alias in connections:
+            counter = QueryCounter(alias)
+            stack.enter_context(
+                connections[alias].execute_wrapper(counter))
+            counters.append(counter)
+        return stack, counters, time.perf_counter()
+
+    def _finish(self, request, response, started, counters):
+        view = getattr(request, 'metrics_view', 'unresolved')
+        action = getattr(request, 'metrics_action', '')
+        REQUEST_LATENCY.labels(
+            view, action, request.method, response.status_code
+        ).observe(time.perf_counter() - started)
+        REQUEST_QUERIES.labels(view, action).observe(
+            sum(counter.count for counter in counters))
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stack, counters, started = self._start(request)
+        with stack:
+            response = self.get_response(request)
+        return self._finish(request, response, started, counters)
+
+    async def __acall__(self, request):
+        stack, counters, started = self._start(request)
+        with stack:
+            response = await self.get_response(request)
+        return self._finish(request, response, started, counters)
@@ -0,0 +1,191 @@
+"""Opt-in sampling profiler for slow requests.
+
+While PROFILER_ENABLED is on, a background thread samples the stack of
+every thread serving a request each PROFILER_INTERVAL_MS. When the
+request took longer than PROFILER_THRESHOLD_MS, or it was picked by
+PROFILER_SAMPLE_RATE, its samples are written to PROFILER_DIR as:
+
+* <name>.folded - collapsed stacks ("frame;frame;frame count" lines)
+  for flamegraph.pl, speedscope, inferno and similar tools;
+* <name>.json - request, timing and the SQL executed.
+
+Only the newest PROFILER_MAX_FILES profiles are kept. See the
+profile_hotspots command for a summary.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+FOLDED_SUFFIX = '.folded'
+META_SUFFIX = '.json'
+
+
+@lru_cache(maxsize=None)
+def frame_name(code) -> str:
+    path = code.co_filename
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and path.startswith(prefix):
+            path = path[len(prefix):].lstrip(os.sep)
+            break
+    # ';' separates frames in the collapsed format
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class Sampler:
+    """Background thread sampling stacks of the registered threads."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._samples: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame_name(frame.f_code))
+                        frame = frame.f_back
+                    samples[tuple(reversed(stack))] += 1
+
+    def start(self):
+        """Start sampling the calling thread."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='profiler-sampler', daemon=True)
+                self._thread.start()
+            self._samples[threading.get_ident()] = Counter()
+
+    def stop(self) -> Counter:
+        """Stop sampling the calling thread and return its samples."""
+        with self._lock:
+            return self._samples.pop(threading.get_ident())
+
+
+sampler = Sampler(settings.PROFILER_INTERVAL_MS / 1000)
+profile_ids = itertools.count()
+
+
+class SqlRecorder:
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.queries: List[dict] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': self.alias,
+                'sql': sql,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+def rotate(directory: str, keep: int):
+    profiles = sorted(
+        (entry for entry in os.scandir(directory)
+         if entry.name.endswith(FOLDED_SUFFIX)),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:max(0, len(profiles) - keep)]:
+        base = entry.path[:-len(FOLDED_SUFFIX)]
+        for path in (entry.path, base + META_SUFFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class SamplingProfilerMiddleware:
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+        if asyncio.iscoroutinefunction(get_response):
+            # same switch to async mode as in MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            # the event loop thread serves many requests at once, its
+            # stacks can't be attributed to one of them
+            return self.get_response(request)
+
+        sampled = random.random() < settings.PROFILER_SAMPLE_RATE
+        recorders = [SqlRecorder(alias) for alias in connections]
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            with ExitStack() as stack:
+                for recorder in recorders:
+                    stack.enter_context(
+                        connections[recorder.alias].execute_wrapper(
+                            recorder))
+                response = self.get_response(request)
+        finally:
+            samples = sampler.stop()
+        duration = (time.perf_counter() - started) * 1000
+
+        if sampled or duration >= settings.PROFILER_THRESHOLD_MS:
+            self.write(request, response, duration, samples, [
+                query for recorder in recorders
+                for query in recorder.queries
+            ])
+        return response
+
+    def write(self, request, response, duration, samples, queries):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        name = '{}_{}-{}_{}_{:.0f}ms'.format(
+            time.strftime('%Y%m%d-%H%M%S'),
+            os.getpid(),
+            next(profile_ids),
+            ''.join(c if c.isalnum() else '-' for c in view),
+            duration,
+        )
+        base = os.path.join(settings.PROFILER_DIR, name)
+        with open(base + FOLDED_SUFFIX, 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{";".join(stack)} {count}\n')
+        with open(base + META_SUFFIX, 'w', encoding='utf-8') as f:
+            json.dump({
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(duration, 3),
+                'interval_ms': settings.PROFILER_INTERVAL_MS,
+                'samples': sum(samples.values()),
+                'queries': queries,
+            }, f, ensure_ascii=False, indent=1)
+        rotate(settings.PROFILER_DIR, settings.PROFILER_MAX_FILES)
@@ -0,0 +1,262 @@
+"""In-process scheduler of periodic maintenance jobs.
+
+Jobs are registered with the job() decorator (see core/jobs.py). Every
+gunicorn worker started with SCHEDULER_ENABLED=1 runs a scheduler
+thread, but only the one holding the leader lock runs jobs: an flock on
+SCHEDULER_LOCK_FILE for workers of one host (SCHEDULER_LOCK=file) or a
+PostgreSQL session advisory lock for several hosts (SCHEDULER_LOCK=db).
+When the leader dies its lock is released and another worker takes over
+within ELECTION_INTERVAL seconds.
+
+Jobs run in a pool of SCHEDULER_WORKERS threads. A thread can't be
+stopped, so a job running longer than its timeout is only reported and
+is not started again until it finishes; on PostgreSQL its queries are
+also cancelled by statement_timeout. Start times are kept in the cache,
+a new leader doesn't rerun jobs that ran recently if the cache is
+shared.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from concurrent import futures
+from importlib import import_module
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (
+    DatabaseError, close_old_connections, connection, connections)
+
+from .metrics import SCHEDULER_JOB_DURATION, SCHEDULER_JOB_RUNS
+
+logger = logging.getLogger(__name__)
+
+JOBS_MODULE = 'core.jobs'
+ELECTION_INTERVAL = 30
+TICK = 1
+ADVISORY_LOCK_ID = 0x466f6f64  # 'Food'
+LAST_RUN_KEY = 'scheduler:last:{}'
+
+OK = 'ok'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+
+
+class Job:
+
+    def __init__(self, name: str, func: Callable[[], object],
+                 interval: float, timeout: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout
+
+    def __call__(self):
+        close_old_connections()
+        postgresql = connection.vendor == 'postgresql'
+        try:
+            if postgresql:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SET statement_timeout = %s',
+                        [int(self.timeout * 1000)])
+            return self.func()
+        finally:
+            if postgresql:
+                # pooled connections keep session settings
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute('RESET statement_timeout')
+                except DatabaseError:
+                    pass
+            connection.close()
+
+
+jobs: Dict[str, Job] = {}
+
+
+def job(interval: float, timeout: float, name: Optional[str] = None):
+    """Register a function to run every interval seconds."""
+    def register(func):
+        job_name = name or func.__name__
+        jobs[job_name] = Job(job_name, func, interval, timeout)
+        return func
+
+    return register
+
+
+def load_jobs() -> Dict[str, Job]:
+    import_module(JOBS_MODULE)
+    return jobs
+
+
+class FileLock:
+    """flock of a file, held by one process of the host at a time."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def acquire(self) -> bool:
+        if self.file is not None:
+            return True
+        file = open(self.path, 'a')
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+        self.file = file
+        return True
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class AdvisoryLock:
+    """PostgreSQL session advisory lock on a connection of its own."""
+
+    def __init__(self, alias: str = 'default'):
+        self.alias = alias
+        self.connection = None
+
+    def acquire(self) -> bool:
+        if self.connection is not None:
+            if self.connection.is_usable():
+                return True
+            # the session and its lock are gone
+            self.release()
+        self.connection = connections.create_connection(self.alias)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_try_advisory_lock(%s)', [ADVISORY_LOCK_ID])
+            locked = cursor.fetchone()[0]
+        if not locked:
+            self.release()
+        return locked
+
+    def release(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def get_lock():
+    if settings.SCHEDULER_LOCK == 'db':
+        return AdvisoryLock()
+    return FileLock(settings.SCHEDULER_LOCK_FILE)
+
+
+class Scheduler:
+
+    def __init__(self, jobs: Iterable[Job], workers: int, lock=None):
+        self.jobs = list(jobs)
+        self.lock = lock or get_lock()
+        self.executor = futures.ThreadPoolExecutor(
+            workers, thread_name_prefix='scheduler')
+        self.running: Dict[str, futures.Future] = {}
+        self.stopped = threading.Event()
+
+    def last_run(self, job: Job) -> float:
+        return cache.get(LAST_RUN_KEY.format(job.name), 0)
+
+    def submit(self, job: Job) -> futures.Future:
+        cache.set(LAST_RUN_KEY.format(job.name), time.time(), None)
+        started = time.monotonic()
+        future = self.executor.submit(job)
+        future.started = started
+        self.running[job.name] = future
+        future.add_done_callback(lambda done: self._finished(job, done))
+        return future
+
+    def _finished(self, job: Job, future: futures.Future):
+        if future.cancelled():
+            return
+        duration = time.monotonic() - future.started
+        status = OK if future.exception() is None else ERROR
+        if status == ERROR:
+            logger.error('Job %s failed after %.2fs', job.name, duration,
+                         exc_info=future.exception())
+        else:
+            logger.info('Job %s done in %.2fs: %s',
+                        job.name, duration, future.result())
+        if duration > job.timeout:
+            status = TIMEOUT
+        SCHEDULER_JOB_DURATION.labels(job.name, status).observe(duration)
+        SCHEDULER_JOB_RUNS.labels(job.name, status).inc()
+
+    def run_pending(self):
+        now = time.monotonic()
+        for job in self.jobs:
+            if self.stopped.is_set():
+                return
+            future = self.running.get(job.name)
+            if future is not None:
+                if not future.done():
+                    if (now - future.started > job.timeout
+                            and not getattr(future, 'reported', False)):
+                        future.reported = True
+                        logger.warning('Job %s runs longer than %ss',
+                                       job.name, job.timeout)
+                    continue
+                del self.running[job.name]
+            if time.time() - self.last_run(job) >= job.interval:
+                self.submit(job)
+
+    def run(self):
+        """Run jobs while this process is the leader, until stop()."""
+        leader = False
+        elected_at = None
+        while not self.stopped.is_set():
+            if (elected_at is None
+                    or time.monotonic() - elected_at > ELECTION_INTERVAL):
+                try:
+                    is_leader = self.lock.acquire()
+                except Exception:
+                    logger.exception('Scheduler election failed')
+                    is_leader = False
+                elected_at = time.monotonic()
+                if is_leader != leader:
+                    leader = is_leader
+                    logger.info('Scheduler of process %s is %s', os.getpid(),
+                                'the leader' if leader else 'on standby')
+            if leader:
+                self.run_pending()
+            self.stopped.wait(TICK)
+        self.lock.release()
+
+    def run_now(self, names: Iterable[str]) -> Dict[str, str]:
+        """Run jobs at once regardless of the lock and wait for them."""
+        selected = {job.name: job for job in self.jobs}
+        submitted = {name: self.submit(selected[name]) for name in names}
+        results = {}
+        for name, future in submitted.items():
+            try:
+                results[name] = str(future.result(selected[name].timeout))
+            except futures.TimeoutError:
+                results[name] = TIMEOUT
+            except Exception as error:
+                results[name] = f'{ERROR}: {error!r}'
+        return results
+
+    def stop(self):
+        self.stopped.set()
+        self.executor.shutdown(wait=False)
+
+
+_scheduler: Optional[Scheduler] = None
+
+
+def start() -> Scheduler:
+    """Start the scheduler thread of this process, see gunicorn.conf.py."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler(
+            load_jobs().values(), settings.SCHEDULER_WORKERS)
+        threading.Thread(
+            target=_scheduler.run, name='scheduler', daemon=True).start()
+    return _scheduler
@@ -0,0 +1,152 @@
+import gzip
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from . import compression
+from .db.middleware import PIN_COOKIE, ReplicaRoutingMiddleware
+from .db.routers import PrimaryReplicaRouter
+
+BODY = json.dumps([{'id': number, 'name': 'рецепт'}
+                   for number in range(100)]).encode()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'],
+                   DATABASE_REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, method='get', status=200, **extra):
+        """Database of a read inside the request, and the response."""
+        databases = []
+
+        def view(request):
+            databases.append(PrimaryReplicaRouter().db_for_read(None))
+            return HttpResponse(status=status)
+
+        response = ReplicaRoutingMiddleware(view)(
+            getattr(self.factory, method)('/api/recipes/', **extra))
+        return databases[0], response
+
+    def test_safe_requests_read_from_replicas(self):
+        database, response = self.request()
+        self.assertEqual(database, 'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(None), 'default')
+
+    def test_write_pins_by_cookie(self):
+        database, response = self.request('post')
+        self.assertEqual(database, 'default')
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+        self.factory.cookies[PIN_COOKIE] = '1'
+        database, _ = self.request()
+        self.assertEqual(database, 'default')
+
+    def test_write_pins_by_token_in_cache(self):
+        self.request('post', HTTP_AUTHORIZATION='Token first')
+        database, _ = self.request(HTTP_AUTHORIZATION='Token first')
+        self.assertEqual(database, 'default')
+        database, _ = self.request(HTTP_AUTHORIZATION='Token second')
+        self.assertEqual(database, 'replica1')
+
+        cache.clear()
+        database, _ = self.request(HTTP_AUTHORIZATION='Token first')
+        self.assertEqual(database, 'replica1')
+
+    def test_failed_write_does_not_pin(self):
+        _, response = self.request(
+            'post', status=400, HTTP_AUTHORIZATION='Token first')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        database, _ = self.request(HTTP_AUTHORIZATION='Token first')
+        self.assertEqual(database, 'replica1')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        database, response = self.request('post')
+        self.assertEqual(database, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class ChooseEncodingTests(SimpleTestCase):
+
+    def assertChooses(self, accept_encoding, expected):
+        self.assertEqual(
+            compression.choose_encoding(accept_encoding), expected)
+
+    def test_preferred_encoding_on_equal_quality(self):
+        self.assertChooses('gzip, deflate, br', 'br')
+        self.assertChooses('*', 'br')
+        with mock.patch.object(compression, 'brotli', None):
+            self.assertChooses('gzip, deflate, br', 'gzip')
+
+    def test_quality_values(self):
+        self.assertChooses('br;q=0.5, gzip;q=0.8', 'gzip')
+        self.assertChooses('gzip;q=0.8, br', 'br')
+        self.assertChooses('br;q=0, gzip', 'gzip')
+        self.assertChooses('*;q=0.1, br;q=0', 'gzip')
+        self.assertChooses('gzip;q=1.0.0, br;q=0', None)
+
+    def test_identity(self):
+        self.assertChooses('gzip, identity;q=0', 'gzip')
+        # no coding the client accepts: sent as is rather than refused
+        self.assertChooses('identity;q=0', None)
+        self.assertChooses('identity', None)
+
+    def test_missing_header(self):
+        self.assertChooses(None, None)
+        self.assertChooses('', None)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, response, accept_encoding='gzip'):
+        return compression.CompressionMiddleware(lambda request: response)(
+            self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_compresses(self):
+        response = self.respond(
+            HttpResponse(BODY, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(
+            response['Content-Length'], str(len(response.content)))
+
+    def test_not_accepted(self):
+        response = self.respond(
+            HttpResponse(BODY, content_type='application/json'),
+            'identity;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, BODY)
+
+    def test_skips_streaming_small_and_binary_responses(self):
+        streaming = self.respond(StreamingHttpResponse(
+            iter([BODY]), content_type='application/json'))
+        self.assertFalse(streaming.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(streaming.streaming_content), BODY)
+        for response in (
+                HttpResponse(b'{}', content_type='application/json'),
+                HttpResponse(BODY, content_type='application/pdf')):
+            response = self.respond(response)
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_precompressed_variant_and_weak_etag(self):
+        response = HttpResponse(BODY, content_type='application/json')
+        response.precompressed = compression.compress_variants(BODY)
+        response['ETag'] = '"abc"'
+        response = self.respond(response, 'br;q=0.5, gzip')
+        self.assertEqual(response.content, response.precompressed['gzip'])
+        self.assertEqual(response['ETag'], 'W/"abc"')
@@ -1,32 +1,75 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from core.db.paginator import EstimatedCountPaginator
 from . import models
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # don't count the whole table again above filtered lists
+    show_full_result_count = False
+
+
 @admin.register(models.Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     readonly_fields = ('favorited',)
     list_display = ('name', 'author', 'favorited')
-    list_filter = ('name', 'author', 'tags')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     search_fields = ('name',)
 
+    def get_queryset(self, request):
+        # a correlated subquery is evaluated for the shown page only
+        favorites = models.FavoriteRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(count=Count('id')).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0))
+
+    @admin.display(description='в избранном',
+                   ordering='favorites_count')
     def favorited(self, obj: models.Recipe) -> int:
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(models.Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
     search_fields = ('name',)
 
 
-admin.site.register(models.User, UserAdmin)
+@admin.register(models.User)
+class FoodUserAdmin(UserAdmin, LargeTableAdmin):
+    pass
+
+
+@admin.register(models.FavoriteRecipe, models.ShoppingCart)
+class UserRecipeAdmin(LargeTableAdmin):
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+
+
+@admin.register(models.Subscription)
+class SubscriptionAdmin(LargeTableAdmin):
+    list_select_related = ('user', 'subscribed_to')
+    raw_id_fields = ('user', 'subscribed_to')
+
+
+@admin.register(models.RecipeTag)
+class RecipeTagAdmin(LargeTableAdmin):
+    list_select_related = ('recipe', 'tag')
+    raw_id_fields = ('recipe',)
+
+
+@admin.register(models.RecipeIngredient)
+class RecipeIngredientAdmin(LargeTableAdmin):
+    list_select_related = ('recipe', 'ingredient')
+    raw_id_fields = ('recipe', 'ingredient')
+
 
 admin.site.register(models.Tag)
-admin.site.register(models.FavoriteRecipe)
-admin.site.register(models.RecipeTag)
-admin.site.register(models.ShoppingCart)
-admin.site.register(models.Subscription)
-admin.site.register(models.RecipeIngredient)
@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class FoodConfig(AppConfig):
     name = 'food'
+
+    def ready(self):
+        from . import catalog, facets
+        from .models import Ingredient, Recipe, RecipeTag, Tag
+        from .search import install_sqlite_fts
+
+        post_migrate.connect(install_sqlite_fts, sender=self)
+        connection_created.connect(catalog.install_sqlite_lower)
+        for signal in (post_save, post_delete):
+            signal.connect(catalog.catalog_changed, sender=Tag)
+            signal.connect(catalog.catalog_changed, sender=Ingredient)
+            signal.connect(catalog.recipe_changed, sender=Recipe)
+        post_save.connect(facets.tag_link_saved, sender=RecipeTag)
+        post_delete.connect(facets.tag_link_deleted, sender=RecipeTag)
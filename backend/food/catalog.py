@@ -0,0 +1,208 @@
+"""Ingredient catalog: bulk upsert and the versions of cached responses.
+
+Cached catalog (tags, ingredients) and recipe responses are keyed by
+a version, so bumping it after a change invalidates them on every worker
+sharing the cache. Versions start from the current time: a version
+evicted from the cache never comes back with a value it had before.
+"""
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+
+from .models import Ingredient
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_CACHE_TIMEOUT = 600
+RECIPE_VERSION_KEY = 'recipe:{}:version'
+# recipe responses show the author, whose changes don't bump the version
+RECIPE_CACHE_TIMEOUT = 300
+
+BATCH_SIZE = 1000
+DIFF_SAMPLE = 20
+
+NAME_MAX_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_MAX_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+SPACES = re.compile(r'\s+')
+
+
+def _version(key: str, timeout: Optional[int]) -> int:
+    version = time.time_ns()
+    if cache.add(key, version, timeout):
+        return version
+    return cache.get(key, version)
+
+
+def _bump_version(key: str, timeout: Optional[int]) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # the key was evicted, start again from the current time
+        version = time.time_ns()
+        cache.set(key, version, timeout)
+        return version
+
+
+def catalog_version() -> int:
+    return _version(CATALOG_VERSION_KEY, None)
+
+
+def bump_catalog_version() -> int:
+    return _bump_version(CATALOG_VERSION_KEY, None)
+
+
+def catalog_cache_key(*parts) -> str:
+    return ':'.join(['catalog', str(catalog_version()), *map(str, parts)])
+
+
+def recipe_version(recipe_id: int) -> int:
+    # outlives the responses cached under it
+    return _version(
+        RECIPE_VERSION_KEY.format(recipe_id), 2 * RECIPE_CACHE_TIMEOUT)
+
+
+def bump_recipe_version(recipe_id: int) -> int:
+    return _bump_version(
+        RECIPE_VERSION_KEY.format(recipe_id), 2 * RECIPE_CACHE_TIMEOUT)
+
+
+def recipe_cache_key(recipe_id: int, *parts) -> str:
+    """Key of a recipe response, which also shows tags and ingredients."""
+    return ':'.join([
+        'recipe', str(recipe_id), str(recipe_version(recipe_id)),
+        str(catalog_version()), *map(str, parts)])
+
+
+def catalog_changed(sender, **kwargs):
+    """post_save and post_delete receiver of Tag and Ingredient."""
+    transaction.on_commit(bump_catalog_version)
+
+
+def recipe_changed(sender, instance, **kwargs):
+    """post_save and post_delete receiver of Recipe.
+
+    Recipe updates save the recipe after replacing its tag and
+    ingredient links, which are bulk created without signals.
+    """
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: bump_recipe_version(recipe_id))
+
+
+def normalize_name(name: str) -> str:
+    return SPACES.sub(' ', name).strip()
+
+
+def name_key(name: str) -> str:
+    """Names are matched regardless of case, e.g. "печенье Oreo"."""
+    return name.lower()
+
+
+class NameKey(Lower):
+    """name_key() in SQL."""
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # the built-in LOWER of SQLite only folds ASCII letters
+        return super().as_sql(
+            compiler, connection, function='PY_LOWER', **extra_context)
+
+
+def install_sqlite_lower(sender, connection, **kwargs):
+    """connection_created receiver adding PY_LOWER to SQLite."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('PY_LOWER', 1, name_key)
+
+
+def normalize_unit(unit: str) -> str:
+    return SPACES.sub(' ', unit).strip()
+
+
+class ImportStats:
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.invalid = 0
+        # (name, old unit or None, new unit) of the first changes
+        self.changes: List[Tuple[str, Optional[str], str]] = []
+
+    def change(self, name: str, old: Optional[str], new: str):
+        if len(self.changes) < DIFF_SAMPLE:
+            self.changes.append((name, old, new))
+
+
+def _upsert(rows: Dict[str, str]):
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    values = ', '.join(['(%s, %s)'] * len(rows))
+    params = [value for row in rows.items() for value in row]
+    # one statement per batch; supported by PostgreSQL and SQLite 3.24+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            f'VALUES {values} '
+            f'ON CONFLICT (name) DO UPDATE '
+            f'SET measurement_unit = EXCLUDED.measurement_unit',
+            params,
+        )
+
+
+def _import_batch(rows: Dict[str, Tuple[str, str]], stats: ImportStats,
+                  dry_run: bool):
+    """Import (name, unit) rows keyed by name_key of the name.
+
+    Existing ingredients keep their name and only get the new unit.
+    """
+    existing = {
+        name_key(name): (name, unit)
+        for name, unit in Ingredient.objects.annotate(
+            key=NameKey('name')).filter(key__in=list(rows)).values_list(
+            'name', 'measurement_unit')
+    }
+    changed = {}
+    for key, (name, unit) in rows.items():
+        name, old = existing.get(key, (name, None))
+        if old == unit:
+            stats.unchanged += 1
+            continue
+        if old is None:
+            stats.created += 1
+        else:
+            stats.updated += 1
+        stats.change(name, old, unit)
+        changed[name] = unit
+    if changed and not dry_run:
+        _upsert(changed)
+
+
+def import_ingredients(rows: Iterable[Tuple[str, str]],
+                       batch_size: int = BATCH_SIZE,
+                       dry_run: bool = False) -> ImportStats:
+    """Create or update ingredients from (name, measurement_unit) rows.
+
+    Rows are normalized and written in batches, each batch in its own
+    short statement. Unchanged rows are not written at all.
+    """
+    stats = ImportStats()
+    batch_size = connection.ops.bulk_batch_size(
+        ['name', 'measurement_unit'], [None] * batch_size) or batch_size
+    batch = {}
+    for name, unit in rows:
+        name, unit = normalize_name(name), normalize_unit(unit)
+        if (not name or not unit or len(name) > NAME_MAX_LENGTH
+                or len(unit) > UNIT_MAX_LENGTH):
+            stats.invalid += 1
+            continue
+        # ON CONFLICT can't touch a row twice in one statement
+        batch[name_key(name)] = name, unit
+        if len(batch) >= batch_size:
+            _import_batch(batch, stats, dry_run)
+            batch = {}
+    if batch:
+        _import_batch(batch, stats, dry_run)
+    if (stats.created or stats.updated) and not dry_run:
+        bump_catalog_version()
+    return stats
@@ -0,0 +1,89 @@
+"""Recipe counts per tag for the tag filter of the recipe list.
+
+Tag.recipes_count holds the global counts. It is bumped in place when
+RecipeTag rows are saved or deleted one by one (see tag_link_saved and
+tag_link_deleted) and by the code that bulk creates them, and is
+reconciled by update_tag_counts(). Counts of a filtered list come from
+one grouped query over the filtered recipes joined to their tags,
+cached for FACETS_CACHE_TIMEOUT seconds.
+"""
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, F, QuerySet
+from django.db.models.functions import Greatest
+
+from core import metrics
+from .models import RecipeTag, Tag
+
+FACETS_CACHE_TIMEOUT = 30
+
+
+def bump_tag_counts(tag_ids: Iterable[int], delta: int):
+    """Add delta recipes to every tag, once per occurrence of its id.
+
+    Counts stop at zero: a drifted count must not break the CHECK
+    constraint of the column, update_tag_counts() fixes it later.
+    """
+    by_count = {}
+    for tag_id, times in Counter(tag_ids).items():
+        by_count.setdefault(times * delta, []).append(tag_id)
+    for change, ids in by_count.items():
+        Tag.objects.filter(pk__in=ids).update(
+            recipes_count=Greatest(F('recipes_count') + change, 0))
+
+
+def tag_link_saved(sender, instance, created, **kwargs):
+    """post_save receiver of RecipeTag."""
+    if created:
+        bump_tag_counts([instance.tag_id], 1)
+
+
+def tag_link_deleted(sender, instance, **kwargs):
+    """post_delete receiver of RecipeTag, also sent by cascades."""
+    bump_tag_counts([instance.tag_id], -1)
+
+
+def update_tag_counts() -> int:
+    """Recount recipes of every tag, return number of changed tags."""
+    counts = dict(RecipeTag.objects.values('tag').annotate(
+        count=Count('id')).values_list('tag', 'count').order_by())
+    changed = []
+    for tag in Tag.objects.only('id', 'recipes_count'):
+        count = counts.get(tag.id, 0)
+        if tag.recipes_count != count:
+            tag.recipes_count = count
+            changed.append(tag)
+    Tag.objects.bulk_update(changed, ['recipes_count'])
+    return len(changed)
+
+
+def _facets(tags: Iterable[Tuple[int, str, int]]) -> List[dict]:
+    return [{'id': tag_id, 'slug': slug, 'count': count}
+            for tag_id, slug, count in tags]
+
+
+def global_tag_facets() -> List[dict]:
+    return _facets(Tag.objects.order_by('name').values_list(
+        'id', 'slug', 'recipes_count'))
+
+
+def tag_facets(recipes: QuerySet, key: str) -> List[dict]:
+    """Counts per tag of the filtered recipes, cached under key.
+
+    recipes must not be filtered by tags, the count would reuse the join.
+    """
+    facets = cache.get(key)
+    metrics.record_cache('facets', facets is not None)
+    if facets is None:
+        # grouped over a join rather than with the recipes as a subquery,
+        # which re-aliases food_recipe used by the raw SQL of the search
+        counts = dict(recipes.order_by().values('tags').annotate(
+            count=Count('id')).values_list('tags', 'count'))
+        facets = _facets(
+            (tag_id, slug, counts.get(tag_id, 0))
+            for tag_id, slug in Tag.objects.order_by('name').values_list(
+                'id', 'slug'))
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,204 @@
+"""Per-follower feed of recipes from subscribed authors.
+
+New recipes are fanned out on write into FeedEntry rows of every
+follower. Authors with more than FANOUT_LIMIT followers are skipped on
+write; their recipes are pulled on read and merged into the feed.
+"""
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from core.metrics import record_cache
+from .models import FeedEntry, Recipe, Subscription, User
+
+FANOUT_LIMIT = 5000
+BACKFILL_SIZE = 50
+MAX_ENTRIES = 1000
+BATCH_SIZE = 1000
+
+PULL_AUTHORS_CACHE_KEY = 'feed:pull_authors'
+PULL_AUTHORS_CACHE_TIMEOUT = 600
+
+# feed position: (pub_date, recipe id) of the last recipe on the page
+Position = Tuple[datetime, int]
+
+
+def pull_authors() -> Set[int]:
+    """Ids of authors whose recipes are not fanned out on write."""
+    authors = cache.get(PULL_AUTHORS_CACHE_KEY)
+    record_cache('feed_pull_authors', authors is not None)
+    if authors is None:
+        authors = set(Subscription.objects.values(
+            'subscribed_to'
+        ).annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gt=FANOUT_LIMIT
+        ).values_list('subscribed_to', flat=True).order_by())
+        cache.set(PULL_AUTHORS_CACHE_KEY, authors,
+                  PULL_AUTHORS_CACHE_TIMEOUT)
+    return authors
+
+
+def _create_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out(recipe: Recipe) -> int:
+    """Put a new recipe into feeds of the author followers."""
+    if recipe.author_id in pull_authors():
+        return 0
+    followers = Subscription.objects.filter(
+        subscribed_to=recipe.author_id
+    ).values_list('user_id', flat=True)
+    entries = [
+        FeedEntry(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+        for user_id in followers
+    ]
+    _create_entries(entries)
+    return len(entries)
+
+
+def follow(user: User, author: User):
+    """Backfill the feed with latest recipes of a new subscription."""
+    follow_many(user, [author.pk])
+
+
+def follow_many(user: User, author_ids: Iterable[int]):
+    """Backfill latest BACKFILL_SIZE recipes of every new subscription.
+
+    One query for all authors: their recipes are numbered newest first
+    per author and only the first BACKFILL_SIZE of each are read.
+    """
+    authors = list(set(author_ids) - pull_authors())
+    if not authors:
+        return
+    if len(authors) == 1:
+        recipes = Recipe.objects.filter(author_id=authors[0])[:BACKFILL_SIZE]
+    else:
+        ranked = Recipe.objects.filter(author_id__in=authors).annotate(
+            number=Window(
+                RowNumber(), partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()]),
+        ).order_by().values('id', 'number')
+        sql, params = ranked.query.sql_with_params()
+        # Django 3.2 can't filter on a window function, the numbered
+        # recipes are filtered as a derived table instead
+        recipes = Recipe.objects.extra(
+            where=[f'food_recipe.id IN (SELECT ranked.id FROM ({sql}) '
+                   f'ranked WHERE ranked.number <= %s)'],
+            params=[*params, BACKFILL_SIZE],
+        ).order_by()
+    _create_entries([
+        FeedEntry(user=user, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes.values_list('id', 'pub_date')
+    ])
+
+
+def unfollow(user: User, author: User):
+    unfollow_many(user, [author.pk])
+
+
+def unfollow_many(user: User, author_ids: Iterable[int]):
+    FeedEntry.objects.filter(
+        user=user, recipe__author__in=list(author_ids)).delete()
+
+
+def _before(position: Optional[Position], date_field: str, id_field: str):
+    if position is None:
+        return Q()
+    pub_date, pk = position
+    return (Q(**{f'{date_field}__lt': pub_date})
+            | Q(**{date_field: pub_date, f'{id_field}__lt': pk}))
+
+
+def get_feed(user: User, limit: int,
+             position: Optional[Position] = None) -> List[Recipe]:
+    """Up to limit recipes of the feed, newest first, after position.
+
+    Entries of authors pulled on read are skipped: they are left from
+    before the author crossed FANOUT_LIMIT and their recipes are pulled
+    anyway, so both halves are disjoint and every row counts.
+    """
+    followed_pull_authors = list(Subscription.objects.filter(
+        user=user, subscribed_to__in=pull_authors(),
+    ).values_list('subscribed_to', flat=True))
+
+    pushed = FeedEntry.objects.filter(
+        _before(position, 'pub_date', 'recipe_id'), user=user,
+    )
+    if followed_pull_authors:
+        pushed = pushed.exclude(recipe__author__in=followed_pull_authors)
+    pushed = pushed.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id')[:limit]
+
+    pulled = Recipe.objects.none()
+    if followed_pull_authors:
+        pulled = Recipe.objects.filter(
+            _before(position, 'pub_date', 'id'),
+            author__in=followed_pull_authors,
+        ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:limit]
+
+    recipe_ids = [recipe_id for _, recipe_id in islice(
+        heapq.merge(pushed, pulled, reverse=True), limit)]
+    recipes = Recipe.objects.in_bulk(recipe_ids)
+    return [recipes[pk] for pk in recipe_ids if pk in recipes]
+
+
+def backfill() -> int:
+    """Fan out latest recipes of every subscription, return rows added."""
+    before = FeedEntry.objects.count()
+    skip = pull_authors()
+    subscriptions = Subscription.objects.exclude(
+        subscribed_to__in=skip
+    ).values_list('user_id', 'subscribed_to_id').order_by(
+        'subscribed_to_id').iterator()
+
+    author_id, recipes, batch = None, [], []
+    for user_id, subscribed_to_id in subscriptions:
+        if subscribed_to_id != author_id:
+            author_id = subscribed_to_id
+            recipes = list(Recipe.objects.filter(
+                author_id=author_id
+            ).values_list('id', 'pub_date')[:BACKFILL_SIZE])
+        batch.extend(
+            FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                      pub_date=pub_date)
+            for recipe_id, pub_date in recipes
+        )
+        if len(batch) >= BATCH_SIZE:
+            _create_entries(batch)
+            batch = []
+    _create_entries(batch)
+    return FeedEntry.objects.count() - before
+
+
+def trim(max_entries: int = MAX_ENTRIES) -> int:
+    """Keep only max_entries newest entries per user, return deleted."""
+    if max_entries < 1:
+        deleted, _ = FeedEntry.objects.all().delete()
+        return deleted
+    deleted = 0
+    overflowing = FeedEntry.objects.values('user').annotate(
+        entries=Count('id')
+    ).filter(
+        entries__gt=max_entries
+    ).values_list('user', flat=True).order_by()
+    for user_id in list(overflowing):
+        last_pub_date, last_recipe_id = FeedEntry.objects.filter(
+            user_id=user_id,
+        ).order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id')[max_entries - 1]
+        count, _ = FeedEntry.objects.filter(
+            _before((last_pub_date, last_recipe_id),
+                    'pub_date', 'recipe_id'),
+            user_id=user_id,
+        ).delete()
+        deleted += count
+    return deleted
@@ -0,0 +1,40 @@
+"""In-memory inverted index ingredient -> recipes for "what can I cook".
+
+Kept up to date from RecipeIngredient like every RecipeIndex, see
+food/recipe_index.py.
+"""
+import heapq
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+from .models import RecipeIngredient
+from .recipe_index import RecipeIndex
+
+
+class IngredientIndex(RecipeIndex):
+    # features are the ingredient ids themselves
+    sources = ((RecipeIngredient, 'ingredient_id', int),)
+
+    def top(self, ingredient_ids: Iterable[int], k: int
+            ) -> List[Tuple[int, int, int]]:
+        """Best covered recipes as (recipe_id, matched, total) tuples.
+
+        Recipes are ranked by the share of their ingredients that are
+        available, then by the number of matched ingredients.
+        """
+        self.refresh()
+        with self._lock:
+            matched = Counter()
+            for ingredient_id in set(ingredient_ids):
+                matched.update(self._postings.get(ingredient_id, ()))
+            totals = {recipe_id: len(self._features[recipe_id])
+                      for recipe_id in matched}
+        return heapq.nlargest(
+            k,
+            ((recipe_id, hits, totals[recipe_id])
+             for recipe_id, hits in matched.items()),
+            key=lambda item: (item[1] / item[2], item[1], item[0]),
+        )
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,33 @@
+"""Cleanup of uploaded files that no recipe refers to any more."""
+import os
+import time
+from typing import Tuple
+
+from django.conf import settings
+
+from .models import Recipe
+
+
+def delete_orphaned_media(min_age: float = 0) -> Tuple[int, int]:
+    """Delete media files older than min_age seconds that no recipe uses.
+
+    min_age protects images of recipes being created right now, saved
+    to disk before their row is committed. Returns (files, bytes).
+    """
+    used = set(Recipe.objects.exclude(image='').values_list(
+        'image', flat=True).order_by().iterator())
+    deadline = time.time() - min_age
+    files = size = 0
+    for root, _, names in os.walk(settings.MEDIA_ROOT):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, settings.MEDIA_ROOT)
+            if relative.replace(os.sep, '/') in used:
+                continue
+            stat = os.stat(path)
+            if stat.st_mtime > deadline:
+                continue
+            os.remove(path)
+            files += 1
+            size += stat.st_size
+    return files, size
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# Search vector is maintained by the database and is not a model field:
+# Django never selects it, the ORM only touches it through food.search.
+PG_FORWARD = [
+    'ALTER TABLE food_recipe ADD COLUMN search_vector tsvector',
+    """CREATE FUNCTION food_recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER food_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON food_recipe
+    FOR EACH ROW EXECUTE PROCEDURE food_recipe_search_vector_update()""",
+    'UPDATE food_recipe SET name = name',
+    """CREATE INDEX food_recipe_search_vector_gin
+    ON food_recipe USING gin (search_vector)""",
+]
+
+PG_BACKWARD = [
+    'DROP TRIGGER IF EXISTS food_recipe_search_vector_trigger ON food_recipe',
+    'DROP FUNCTION IF EXISTS food_recipe_search_vector_update()',
+    'ALTER TABLE food_recipe DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS food_recipe_fts_ai',
+    'DROP TRIGGER IF EXISTS food_recipe_fts_ad',
+    'DROP TRIGGER IF EXISTS food_recipe_fts_au',
+    'DROP TABLE IF EXISTS food_recipe_fts',
+]
+
+
+def forward(apps, schema_editor):
+    # sqlite FTS5 table is created by food.search.install_sqlite_fts
+    # on post_migrate, see the note there
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in PG_FORWARD:
+            schema_editor.execute(sql)
+
+
+def backward(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = PG_BACKWARD
+    elif vendor == 'sqlite':
+        statements = SQLITE_BACKWARD
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, backward),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+def count_recipes(apps, schema_editor):
+    Tag = apps.get_model('food', 'Tag')
+    RecipeTag = apps.get_model('food', 'RecipeTag')
+    counts = RecipeTag.objects.values('tag').annotate(
+        count=models.Count('id')).values_list('tag', 'count').order_by()
+    for tag_id, count in counts:
+        Tag.objects.filter(pk=tag_id).update(recipes_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0005_user_first_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='число рецептов'),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
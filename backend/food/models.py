@@ -44,6 +44,8 @@ class Tag(models.Model):
         validators=[RegexValidator(regex=r'#[0-9,A-F]{6}')],
         unique=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        'число рецептов', default=0, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -69,6 +71,10 @@ class Recipe(models.Model):
         'Tag', through='RecipeTag', related_name='recipes')
     pub_date = models.DateTimeField(
         'дата создания', auto_created=True, auto_now_add=True)
+    popularity = models.FloatField(
+        'популярность', default=0, db_index=True, editable=False)
+    trending = models.FloatField(
+        'в тренде', default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ['-pub_date']
@@ -132,6 +138,8 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_cart'
     )
+    created = models.DateTimeField(
+        'дата добавления', auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -156,6 +164,8 @@ class FavoriteRecipe(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites'
     )
+    created = models.DateTimeField(
+        'дата добавления', auto_now_add=True, db_index=True)
 
     class Meta:
         constraints = [
@@ -192,3 +202,36 @@ class RecipeIngredient(models.Model):
 
     def __str__(self):
         return f'{self.recipe}: {self.ingredient} -> {self.amount}'
+
+
+class FeedEntry(models.Model):
+    """Recipe fanned out to a follower of its author, see food.feed."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField('дата создания рецепта')
+
+    class Meta:
+        ordering = ['-pub_date', '-recipe']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
@@ -0,0 +1,105 @@
+"""Base of the in-memory inverted indexes feature -> recipes.
+
+Every worker process keeps its own copy. An index is built once from
+the link tables of its sources (e.g. RecipeIngredient) and then caught
+up incrementally: recipes are saved with all their links recreated by
+bulk_create, so every new link row above the last seen id marks a
+recipe whose features have to be reloaded. Deleted recipes are pruned
+when the view fails to fetch them. A full rebuild runs every
+REBUILD_INTERVAL seconds to pick up rows committed out of id order.
+"""
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from django.db.models import Model
+
+REBUILD_INTERVAL = 600
+
+# link model, its column and the feature of the column value
+Source = Tuple[Type[Model], str, Callable[[int], int]]
+
+
+class RecipeIndex:
+    sources: Tuple[Source, ...] = ()
+    # array typecode of the features of a recipe
+    typecode = 'I'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[int, array] = {}
+        self._features: Dict[int, array] = {}
+        self._last_ids: Dict[Type[Model], int] = {}
+        self._built_at = None
+
+    def _clear(self):
+        self._postings = {}
+        self._features = {}
+        self._last_ids = {}
+
+    def _add(self, recipe_id: int, features: Iterable[int]):
+        features = array(self.typecode, sorted(set(features)))
+        self._features[recipe_id] = features
+        for feature in features:
+            self._postings.setdefault(feature, array('I')).append(recipe_id)
+
+    def _remove(self, recipe_id: int):
+        for feature in self._features.pop(recipe_id, ()):
+            posting = self._postings[feature]
+            posting.remove(recipe_id)
+            if not posting:
+                del self._postings[feature]
+
+    def _rebuilt(self):
+        """Called with the lock held after a full rebuild."""
+
+    def _load(self, recipe_ids: Optional[Iterable[int]] = None
+              ) -> Dict[int, List[int]]:
+        """Features of the recipes, of all of them if recipe_ids is None."""
+        recipes = {}
+        for model, column, feature in self.sources:
+            queryset = model.objects.all()
+            if recipe_ids is not None:
+                queryset = queryset.filter(recipe_id__in=recipe_ids)
+            last_id = self._last_ids.get(model, 0)
+            for pk, recipe_id, value in queryset.values_list(
+                    'id', 'recipe_id', column).order_by().iterator():
+                recipes.setdefault(recipe_id, []).append(feature(value))
+                last_id = max(last_id, pk)
+            self._last_ids[model] = last_id
+        return recipes
+
+    def rebuild(self):
+        with self._lock:
+            self._clear()
+            for recipe_id, features in self._load().items():
+                self._add(recipe_id, features)
+            self._rebuilt()
+            self._built_at = time.monotonic()
+
+    def refresh(self):
+        """Reload recipes with links written since the last refresh."""
+        if (self._built_at is None
+                or time.monotonic() - self._built_at > REBUILD_INTERVAL):
+            self.rebuild()
+            return
+
+        with self._lock:
+            touched = set()
+            for model, _, _ in self.sources:
+                touched.update(model.objects.filter(
+                    id__gt=self._last_ids.get(model, 0)
+                ).values_list('recipe_id', flat=True).order_by())
+            if not touched:
+                return
+            loaded = self._load(touched)
+            for recipe_id in touched:
+                self._remove(recipe_id)
+                if recipe_id in loaded:
+                    self._add(recipe_id, loaded[recipe_id])
+
+    def discard(self, recipe_ids: Iterable[int]):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
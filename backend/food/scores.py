@@ -0,0 +1,86 @@
+"""Precomputed recipe popularity and trending scores.
+
+popularity: weighted all-time number of favorites and shopping carts,
+    bumped in place by the API and reconciled by update_scores().
+trending: the same activity decayed exponentially with its age, only
+    recomputed by update_scores() (manage.py update_recipe_scores).
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable
+
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import FavoriteRecipe, Recipe, ShoppingCart
+
+FAVORITE_WEIGHT = 2.0
+SHOPPING_CART_WEIGHT = 1.0
+
+TRENDING_HALF_LIFE = timedelta(days=3)
+TRENDING_WINDOW = timedelta(days=30)
+
+BATCH_SIZE = 1000
+
+ACTIVITY_WEIGHTS = (
+    (FavoriteRecipe, FAVORITE_WEIGHT),
+    (ShoppingCart, SHOPPING_CART_WEIGHT),
+)
+
+
+def bump_popularity(recipe_ids: Iterable[int], weight: float) -> int:
+    """Add weight (negative on removal) to popularity of the recipes."""
+    return Recipe.objects.filter(pk__in=list(recipe_ids)).update(
+        popularity=F('popularity') + weight)
+
+
+def compute_popularity() -> Dict[int, float]:
+    scores = defaultdict(float)
+    for model, weight in ACTIVITY_WEIGHTS:
+        counts = model.objects.values('recipe').annotate(
+            count=Count('id')).values_list('recipe', 'count').order_by()
+        for recipe_id, count in counts:
+            scores[recipe_id] += weight * count
+    return scores
+
+
+def compute_trending(now=None) -> Dict[int, float]:
+    now = now or timezone.now()
+    half_life = TRENDING_HALF_LIFE.total_seconds()
+    scores = defaultdict(float)
+    for model, weight in ACTIVITY_WEIGHTS:
+        activity = model.objects.filter(
+            created__gte=now - TRENDING_WINDOW
+        ).values_list('recipe', 'created').order_by().iterator()
+        for recipe_id, created in activity:
+            age = (now - created).total_seconds()
+            scores[recipe_id] += weight * math.pow(0.5, age / half_life)
+    return scores
+
+
+def _store(field: str, scores: Dict[int, float]) -> int:
+    """Write changed scores, zero the ones that have no activity left.
+
+    Every non-zero stored score is compared, including negative ones left
+    by bump_popularity for activity older than the score.
+    """
+    current = dict(Recipe.objects.exclude(
+        **{field: 0}).values_list('id', field).order_by())
+    changed = []
+    for recipe_id in set(current) | set(scores):
+        score = round(scores.get(recipe_id, 0.0), 6)
+        if current.get(recipe_id, 0.0) != score:
+            recipe = Recipe(pk=recipe_id)
+            setattr(recipe, field, score)
+            changed.append(recipe)
+    Recipe.objects.bulk_update(changed, [field], batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def update_scores() -> Dict[str, int]:
+    """Recompute both scores, return number of updated recipes each."""
+    return {
+        'popularity': _store('popularity', compute_popularity()),
+        'trending': _store('trending', compute_trending()),
+    }
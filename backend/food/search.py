@@ -0,0 +1,110 @@
+"""Full-text search over Recipe.name and Recipe.text.
+
+The search vector is precomputed by the database itself (see migration
+0002_recipe_search), so it is not a model field and never gets loaded
+with the recipe rows:
+
+* PostgreSQL: ``food_recipe.search_vector`` tsvector column with a GIN
+  index, filled by a trigger using the russian and english configs.
+* SQLite: ``food_recipe_fts`` FTS5 table kept in sync by triggers.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'food_recipe_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+PG_QUERY = ("(plainto_tsquery('russian', %s) "
+            "|| plainto_tsquery('english', %s))")
+
+
+def _fts5_query(query: str) -> str:
+    # quote every token so user input can't use FTS5 query syntax,
+    # last token is a prefix to match partially typed words
+    tokens = [f'"{token}"' for token in TOKEN_RE.findall(query)]
+    if tokens:
+        tokens[-1] += '*'
+    return ' '.join(tokens)
+
+
+def search_recipes(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter queryset by query and order it by relevance."""
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if connection.vendor == 'postgresql':
+        params = [query, query]
+        where = f'food_recipe.search_vector @@ {PG_QUERY}'
+        rank = RawSQL(
+            f'ts_rank(food_recipe.search_vector, {PG_QUERY})',
+            params, output_field=FloatField())
+    elif connection.vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return queryset.none()
+        params = [fts_query]
+        where = (f'food_recipe.id IN (SELECT rowid FROM {FTS_TABLE} '
+                 f'WHERE {FTS_TABLE} MATCH %s)')
+        # bm25 is negative, the better the match the lower it is
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = food_recipe.id',
+            params, output_field=FloatField())
+    else:
+        return queryset.filter(name__icontains=query)
+
+    # extra() instead of id__in=RawSQL(...): the latter gets wrapped
+    # into a scalar subquery and matches the first row only
+    return queryset.extra(where=[where], params=params).annotate(
+        search_rank=rank).order_by('-search_rank', '-pub_date')
+
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, text, content='food_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON food_recipe BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON food_recipe BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+            VALUES ('delete', old.id, old.name, old.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF name, text ON food_recipe BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+            VALUES ('delete', old.id, old.name, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END""",
+]
+
+
+def install_sqlite_fts(sender, using='default', **kwargs):
+    """post_migrate handler creating the FTS5 stand-in on SQLite.
+
+    SQLite migrations rebuild altered tables and drop their triggers,
+    so this runs after every migrate and reindexes if anything was lost.
+    """
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE %s",
+            [f'{FTS_TABLE}_a_'])
+        if cursor.fetchone()[0] == 3:
+            return
+        for sql in SQLITE_FTS_SQL:
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,129 @@
+"""In-memory sparse recipe x feature matrix for similar recipes.
+
+Features are the ingredients and tags of a recipe, weighted by
+INGREDIENT_WEIGHT or TAG_WEIGHT times their inverse document frequency.
+Recipes are ranked by the cosine similarity of their feature vectors,
+computed as a sparse dot product over the posting lists of the
+features of the requested recipe.
+
+Kept up to date from RecipeIngredient and RecipeTag like every
+RecipeIndex, see food/recipe_index.py. Recipe norms use the frequencies
+known when the recipe was added, a rebuild recomputes them all. Top
+results are cached per recipe version.
+"""
+import heapq
+import math
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from django.core.cache import cache
+
+from core import metrics
+from .catalog import recipe_version
+from .models import RecipeIngredient, RecipeTag
+from .recipe_index import RecipeIndex
+
+INGREDIENT_WEIGHT = 1.0
+TAG_WEIGHT = 0.5
+# features of more than this share of recipes only rank candidates
+# found by rarer ones instead of adding every recipe they are in
+COMMON_SHARE = 0.05
+COMMON_MIN_RECIPES = 1000
+TOP_K = 50
+CACHE_TIMEOUT = 600
+
+
+def ingredient_feature(ingredient_id: int) -> int:
+    return ingredient_id << 1
+
+
+def tag_feature(tag_id: int) -> int:
+    return tag_id << 1 | 1
+
+
+def _contains(features: array, feature: int) -> bool:
+    position = bisect_left(features, feature)
+    return position < len(features) and features[position] == feature
+
+
+class SimilarityIndex(RecipeIndex):
+    sources = (
+        (RecipeIngredient, 'ingredient_id', ingredient_feature),
+        (RecipeTag, 'tag_id', tag_feature),
+    )
+    typecode = 'Q'
+
+    def __init__(self):
+        super().__init__()
+        self._norms: Dict[int, float] = {}
+
+    def _clear(self):
+        super()._clear()
+        self._norms = {}
+
+    def _weight(self, feature: int) -> float:
+        kind = TAG_WEIGHT if feature & 1 else INGREDIENT_WEIGHT
+        return kind * math.log(
+            1 + len(self._features) / len(self._postings[feature]))
+
+    def _norm(self, features: Iterable[int]) -> float:
+        return math.sqrt(sum(
+            self._weight(feature) ** 2 for feature in features))
+
+    def _add(self, recipe_id: int, features: Iterable[int]):
+        super()._add(recipe_id, features)
+        self._norms[recipe_id] = self._norm(self._features[recipe_id])
+
+    def _remove(self, recipe_id: int):
+        self._norms.pop(recipe_id, None)
+        super()._remove(recipe_id)
+
+    def _rebuilt(self):
+        # norms of the first recipes used incomplete frequencies
+        for recipe_id, features in self._features.items():
+            self._norms[recipe_id] = self._norm(features)
+
+    def top(self, recipe_id: int, k: int) -> List[Tuple[int, float]]:
+        """Most similar recipes as (recipe_id, similarity) tuples."""
+        self.refresh()
+        with self._lock:
+            features = self._features.get(recipe_id)
+            if not features:
+                return []
+            common = max(COMMON_SHARE * len(self._features),
+                         COMMON_MIN_RECIPES)
+            scores = defaultdict(float)
+            for feature in sorted(
+                    features, key=lambda f: len(self._postings[f])):
+                posting = self._postings[feature]
+                weight = self._weight(feature) ** 2
+                if len(posting) <= common or not scores:
+                    for other in posting:
+                        scores[other] += weight
+                    continue
+                for other in scores:
+                    if _contains(self._features[other], feature):
+                        scores[other] += weight
+            scores.pop(recipe_id, None)
+            norm = self._norms[recipe_id]
+            similarities = (
+                (other, score / (norm * self._norms[other]))
+                for other, score in scores.items())
+            return heapq.nlargest(
+                k, similarities, key=lambda item: (item[1], -item[0]))
+
+
+similarity_index = SimilarityIndex()
+
+
+def similar_recipes(recipe_id: int) -> List[Tuple[int, float]]:
+    """TOP_K most similar recipes, cached until the recipe changes."""
+    key = f'similar:{recipe_id}:{recipe_version(recipe_id)}'
+    top = cache.get(key)
+    metrics.record_cache('similar', top is not None)
+    if top is None:
+        top = similarity_index.top(recipe_id, TOP_K)
+        cache.set(key, top, CACHE_TIMEOUT)
+    return top
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from . import units
+
+
+class RenderTests(SimpleTestCase):
+
+    def assertRenders(self, amount, unit, expected):
+        self.assertEqual(units.render(amount, unit), expected)
+
+    def test_mass_boundary(self):
+        self.assertRenders(999, 'г', ('999', 'г'))
+        self.assertRenders(1000, 'г', ('1', 'кг'))
+        self.assertRenders(1001, 'г', ('1001', 'г'))
+        self.assertRenders(2, 'кг', ('2', 'кг'))
+
+    def test_fractions_are_rounded_to_two_digits_only(self):
+        self.assertRenders(1500, 'г', ('1.5', 'кг'))
+        self.assertRenders(1230, 'г', ('1.23', 'кг'))
+        # 1.234 кг would need a third digit
+        self.assertRenders(1234, 'г', ('1234', 'г'))
+        self.assertRenders(1250, 'мл', ('1.25', 'л'))
+
+    def test_kitchen_units_are_only_enlarged(self):
+        self.assertRenders(6, 'ч. л.', ('2', 'ст. л.'))
+        self.assertRenders(4, 'ч. л.', ('4', 'ч. л.'))
+        self.assertRenders(50, 'ст. л.', ('3', 'стакан'))
+        self.assertRenders(4, 'стакан', ('1', 'л'))
+        self.assertRenders(1, 'ст. л.', ('1', 'ст. л.'))
+
+    def test_metric_amounts_stay_metric(self):
+        self.assertRenders(250, 'мл', ('250', 'мл'))
+        self.assertRenders(2, 'л', ('2', 'л'))
+
+    def test_unknown_units(self):
+        self.assertRenders(3, 'шт.', ('3', 'шт.'))
+        self.assertRenders(1000, 'по вкусу', ('1000', 'по вкусу'))
@@ -0,0 +1,225 @@
+"""Streaming export and import of recipes as newline-delimited JSON.
+
+Every line is one record with a "type": a header, then all tags and
+ingredients, then recipes with their tag slugs, ingredient names and
+amounts and the image path. Related rows are referenced by natural keys
+(author email, tag slug, ingredient name), so ids are remapped on
+import. Both directions work in chunks of recipes; only the tag and
+ingredient catalogs are held in memory.
+"""
+import json
+from typing import Dict, IO, Iterable, Iterator, List, Optional
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .catalog import bump_catalog_version
+from .facets import update_tag_counts
+from .models import (
+    Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag, User)
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 500
+
+
+def _dump(f: IO[str], record: dict):
+    f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+    f.write('\n')
+
+
+def _recipe_chunks(chunk_size: int) -> Iterator[List[dict]]:
+    last_id = 0
+    while True:
+        chunk = list(Recipe.objects.filter(id__gt=last_id).order_by(
+            'id').values(
+            'id', 'author__email', 'name', 'text', 'cooking_time',
+            'pub_date', 'image')[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1]['id']
+        yield chunk
+
+
+def export_recipes(f: IO[str], chunk_size: int = CHUNK_SIZE) -> int:
+    """Write all recipes to a text stream, return their number."""
+    _dump(f, {'type': 'header', 'version': FORMAT_VERSION})
+    for tag in Tag.objects.values('name', 'slug', 'color').iterator():
+        _dump(f, {'type': 'tag', **tag})
+    for ingredient in Ingredient.objects.values(
+            'name', 'measurement_unit').iterator():
+        _dump(f, {'type': 'ingredient', **ingredient})
+
+    exported = 0
+    for chunk in _recipe_chunks(chunk_size):
+        ids = [recipe['id'] for recipe in chunk]
+        tags, ingredients = {}, {}
+        for recipe_id, slug in RecipeTag.objects.filter(
+                recipe_id__in=ids).values_list('recipe_id', 'tag__slug'):
+            tags.setdefault(recipe_id, []).append(slug)
+        for recipe_id, name, amount in RecipeIngredient.objects.filter(
+                recipe_id__in=ids).values_list(
+                'recipe_id', 'ingredient__name', 'amount'):
+            ingredients.setdefault(recipe_id, []).append([name, amount])
+        for recipe in chunk:
+            _dump(f, {
+                'type': 'recipe',
+                'id': recipe['id'],
+                'author': recipe['author__email'],
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'pub_date': recipe['pub_date'].isoformat(),
+                'image': recipe['image'],
+                'tags': tags.get(recipe['id'], []),
+                'ingredients': ingredients.get(recipe['id'], []),
+            })
+        exported += len(chunk)
+    return exported
+
+
+class ImportStats:
+
+    def __init__(self):
+        self.created = 0
+        self.existing = 0
+        self.no_author = 0
+        self.tags_created = 0
+        self.ingredients_created = 0
+
+
+class RecipeImporter:
+    """Import records produced by export_recipes."""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE,
+                 default_author: Optional[User] = None):
+        self.chunk_size = chunk_size
+        self.default_author = default_author
+        self.stats = ImportStats()
+        self.tags: Dict[str, int] = dict(
+            Tag.objects.values_list('slug', 'id'))
+        self.ingredients: Dict[str, int] = dict(
+            Ingredient.objects.values_list('name', 'id'))
+        self.pending: List[Ingredient] = []
+
+    def _tag(self, record: dict):
+        if record['slug'] in self.tags:
+            return
+        tag, created = Tag.objects.get_or_create(
+            slug=record['slug'],
+            defaults={'name': record['name'], 'color': record['color']},
+        )
+        self.tags[tag.slug] = tag.id
+        self.stats.tags_created += created
+
+    def _ingredient(self, record: dict):
+        if record['name'] not in self.ingredients:
+            self.pending.append(Ingredient(
+                name=record['name'],
+                measurement_unit=record['measurement_unit']))
+        if len(self.pending) >= self.chunk_size:
+            self._create_ingredients()
+
+    def _create_ingredients(self):
+        if not self.pending:
+            return
+        before = Ingredient.objects.count()
+        Ingredient.objects.bulk_create(self.pending, ignore_conflicts=True)
+        self.stats.ingredients_created += (
+            Ingredient.objects.count() - before)
+        self.ingredients.update(Ingredient.objects.filter(
+            name__in=[ingredient.name for ingredient in self.pending]
+        ).values_list('name', 'id'))
+        self.pending = []
+
+    @transaction.atomic
+    def _recipes(self, records: List[dict]):
+        authors = dict(User.objects.filter(
+            email__in={record['author'] for record in records}
+        ).values_list('email', 'id'))
+        existing = set(Recipe.objects.filter(
+            name__in=[record['name'] for record in records]
+        ).values_list('name', flat=True))
+
+        new = []
+        for record in records:
+            if record['name'] in existing:
+                self.stats.existing += 1
+                continue
+            author_id = authors.get(record['author'])
+            if author_id is None and self.default_author is not None:
+                author_id = self.default_author.id
+            if author_id is None:
+                self.stats.no_author += 1
+                continue
+            existing.add(record['name'])
+            new.append((record, Recipe(
+                author_id=author_id,
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+            )))
+        if not new:
+            return
+
+        Recipe.objects.bulk_create(recipe for _, recipe in new)
+        # bulk_create returns primary keys on PostgreSQL only
+        ids = dict(Recipe.objects.filter(
+            name__in=[recipe.name for _, recipe in new]
+        ).values_list('name', 'id'))
+        tags, ingredients = [], []
+        for record, recipe in new:
+            recipe.id = ids[recipe.name]
+            # auto_now_add overwrote the exported date on insert
+            recipe.pub_date = parse_datetime(record['pub_date'])
+            tags.extend(
+                RecipeTag(recipe_id=recipe.id, tag_id=self.tags[slug])
+                for slug in set(record['tags']) if slug in self.tags)
+            ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=self.ingredients[name],
+                    amount=amount)
+                for name, amount in record['ingredients']
+                if name in self.ingredients)
+        Recipe.objects.bulk_update(
+            [recipe for _, recipe in new], ['pub_date'])
+        RecipeTag.objects.bulk_create(tags, ignore_conflicts=True)
+        RecipeIngredient.objects.bulk_create(
+            ingredients, ignore_conflicts=True)
+        self.stats.created += len(new)
+
+    def run(self, lines: Iterable[str]) -> ImportStats:
+        records = (json.loads(line) for line in lines if line.strip())
+        header = next(records, None)
+        if (header is None or header.get('type') != 'header'
+                or header.get('version') != FORMAT_VERSION):
+            raise ValueError('Not a recipe export of a supported version')
+
+        chunk = []
+        for record in records:
+            if record['type'] == 'tag':
+                self._tag(record)
+            elif record['type'] == 'ingredient':
+                self._ingredient(record)
+            elif record['type'] == 'recipe':
+                self._create_ingredients()
+                chunk.append(record)
+                if len(chunk) >= self.chunk_size:
+                    self._recipes(chunk)
+                    chunk = []
+        self._create_ingredients()
+        if chunk:
+            self._recipes(chunk)
+        if self.stats.tags_created or self.stats.ingredients_created:
+            # bulk created rows sent no post_save
+            bump_catalog_version()
+        if self.stats.created:
+            update_tag_counts()
+        return self.stats
+
+
+def import_recipes(lines: Iterable[str], chunk_size: int = CHUNK_SIZE,
+                   default_author: Optional[User] = None) -> ImportStats:
+    """Create recipes from export_recipes lines, skipping existing names."""
+    return RecipeImporter(chunk_size, default_author).run(lines)
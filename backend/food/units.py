@@ -0,0 +1,66 @@
+"""Human-friendly amounts of the shopping list.
+
+UNITS covers the distinct measurement_unit values of
+data/ingredients.csv. Mass and volume units are converted to integer
+amounts of a canonical unit (г and мл) and rendered back in the largest
+fitting unit of their family, other units are shown as they are. Every
+ingredient has a single unit, so amounts are summed per ingredient and
+only the totals are converted.
+"""
+from decimal import Decimal
+from typing import Dict, Tuple
+
+MASS = 'mass'
+VOLUME = 'volume'
+
+# unit: (family, amount of the canonical unit of the family in one unit)
+UNITS: Dict[str, Tuple[str, int]] = {
+    'г': (MASS, 1),
+    'кг': (MASS, 1000),
+    'мл': (VOLUME, 1),
+    'ч. л.': (VOLUME, 5),
+    'ст. л.': (VOLUME, 15),
+    'стакан': (VOLUME, 250),
+    'л': (VOLUME, 1000),
+}
+
+# units amounts are rendered in, largest first: (unit, factor, metric,
+# may be fractional)
+DISPLAY_UNITS = {
+    MASS: (
+        ('кг', 1000, True, True),
+        ('г', 1, True, False),
+    ),
+    VOLUME: (
+        ('л', 1000, True, True),
+        ('стакан', 250, False, False),
+        ('ст. л.', 15, False, False),
+        ('ч. л.', 5, False, False),
+        ('мл', 1, True, False),
+    ),
+}
+# fractional amounts are shown with at most this many digits
+FRACTION_DIGITS = 2
+
+
+def render(amount: int, unit: str) -> Tuple[str, str]:
+    """Human-friendly (amount, unit) of an amount in unit.
+
+    Metric amounts stay metric, kitchen units (spoons, glasses) are only
+    ever enlarged: 6 ч. л. become 2 ст. л., 1500 г become 1.5 кг.
+    """
+    family, source_factor = UNITS.get(unit, (unit, 1))
+    quantity = amount * source_factor
+    display_units = DISPLAY_UNITS.get(family, ())
+    source_metric = next(
+        (metric for name, _, metric, _ in display_units if name == unit),
+        True)
+    for name, factor, metric, fractional in display_units:
+        if (factor < source_factor or quantity < factor
+                or (source_metric and not metric)):
+            continue
+        step = factor // 10 ** FRACTION_DIGITS if fractional else factor
+        if step and quantity % step == 0:
+            amount = (Decimal(quantity) / factor).normalize()
+            return f'{amount:f}', name
+    return str(amount), unit
@@ -0,0 +1,52 @@
+import glob
+import os
+
+# import the application once in the master, workers fork with Django,
+# the views and the warmed caches already loaded
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+if preload_app:
+    # no warm-up thread in the master, see when_ready
+    os.environ['PRELOAD_APP'] = '1'
+
+
+def on_starting(server):
+    # drop metric files of the previous run, see core/metrics.py
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from django.conf import settings
+    from django.db import connections
+
+    from core.db.pool import close_pools
+
+    if settings.WARMUP_ON_START:
+        from api.apps import warm_up
+
+        warm_up()
+    # sockets must not be shared by the forked workers
+    connections.close_all()
+    close_pools()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # every worker competes for the leader lock, see core/scheduler.py
+    from django.conf import settings
+
+    if settings.SCHEDULER_ENABLED:
+        from core import scheduler
+
+        scheduler.start()